@@ -0,0 +1,116 @@
+# EMDB/consolidation.py
+
+import logging
+
+import numpy as np
+
+RETENTION_POLICIES = ("recent", "frequent")
+
+
+class MemoryConsolidator:
+    """
+    에이전트 기억 컬렉션을 정리하는 작업입니다.
+    저장된 임베딩의 코사인 유사도로 항목을 묶어 같은 묶음의 중복 항목은 지우고 대표 항목의
+    merged_count를 늘리며, 컬렉션별 최대 항목 수를 넘으면 보존 정책에 따라 나머지를 지웁니다.
+    - recent: 최근에 기록된 항목을 남깁니다.
+    - frequent: 많이 병합된(자주 반복된) 항목을 먼저 남기고, 같으면 최근 항목을 남깁니다.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold=0.95,
+        max_entries=None,
+        retention="recent",
+        collections=("experience", "case", "legal"),
+    ):
+        """
+        :param similarity_threshold: 이 값 이상으로 비슷한 항목은 같은 묶음으로 봅니다.
+        :param max_entries: {컬렉션 이름: 최대 항목 수}. 없는 컬렉션은 제한하지 않습니다.
+        :param retention: 최대 항목 수를 넘을 때의 보존 정책(recent 또는 frequent)
+        :param collections: 정리할 컬렉션 이름
+        """
+        if retention not in RETENTION_POLICIES:
+            raise ValueError(f"Unsupported retention policy: {retention}")
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries or {}
+        self.retention = retention
+        self.collections = collections
+
+    def consolidate(self, store):
+        """
+        store(EMDB.db)의 컬렉션들을 정리하고 컬렉션별 결과를 반환합니다.
+        """
+        store.flush()
+        report = {}
+        # 정리하는 동안 같은 저장소로의 쓰기를 막습니다.
+        with store.write_lock:
+            for name in self.collections:
+                report[name] = self._consolidate_collection(
+                    store._get_collection(name), self.max_entries.get(name)
+                )
+        logging.info(f"Memory consolidation for {store.agent_name}: {report}")
+        return report
+
+    def _consolidate_collection(self, collection, max_entries):
+        entries = collection.get(include=["embeddings", "metadatas"])
+        ids = entries["ids"]
+        if not ids:
+            return {"before": 0, "merged": 0, "dropped": 0, "after": 0}
+        metadatas = [metadata or {} for metadata in entries["metadatas"]]
+        embeddings = np.asarray(entries["embeddings"], dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+
+        # 최근 항목이 묶음의 대표가 되도록 기록 시각의 역순으로 훑습니다.
+        order = sorted(
+            range(len(ids)),
+            key=lambda i: metadatas[i].get("created_at", 0.0),
+            reverse=True,
+        )
+        representatives = []
+        merged_counts = {}
+        duplicates = []
+        for i in order:
+            if representatives:
+                similarities = embeddings[representatives] @ embeddings[i]
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    kept = representatives[best]
+                    merged_counts[kept] = (
+                        merged_counts.get(kept, metadatas[kept].get("merged_count", 0))
+                        + 1
+                        + metadatas[i].get("merged_count", 0)
+                    )
+                    duplicates.append(ids[i])
+                    continue
+            representatives.append(i)
+
+        over_cap = []
+        if max_entries is not None and len(representatives) > max_entries:
+            if self.retention == "frequent":
+                representatives.sort(
+                    key=lambda i: (
+                        merged_counts.get(i, metadatas[i].get("merged_count", 0)),
+                        metadatas[i].get("created_at", 0.0),
+                    ),
+                    reverse=True,
+                )
+            over_cap = [ids[i] for i in representatives[max_entries:]]
+            representatives = representatives[:max_entries]
+
+        kept = set(representatives)
+        updates = [i for i in merged_counts if i in kept]
+        if updates:
+            collection.update(
+                ids=[ids[i] for i in updates],
+                metadatas=[
+                    {**metadatas[i], "merged_count": merged_counts[i]} for i in updates
+                ],
+            )
+        if duplicates or over_cap:
+            collection.delete(ids=duplicates + over_cap)
+        return {
+            "before": len(ids),
+            "merged": len(duplicates),
+            "dropped": len(over_cap),
+            "after": len(representatives),
+        }
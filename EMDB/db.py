@@ -1,107 +1,432 @@
 # EMDB/db.py
 
+import logging
 import os
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from .embedding import get_embedding_service
+
+
+class MemoryHit(NamedTuple):
+    """
+    검색 결과 하나입니다. text는 컬렉션에 따라 메타데이터의 필드 값 또는 문서입니다.
+    """
+
+    id: str
+    text: str
+    distance: Optional[float]
+    metadata: Optional[Dict[str, Any]]
+
+
+class MemoryContext(NamedTuple):
+    """
+    query_all의 결과입니다. 컬렉션별로 묶은 문맥 블록이며, 질의하지 않은 컬렉션의 값은 None입니다.
+    """
+
+    experience: Optional[str] = None
+    case: Optional[str] = None
+    legal: Optional[str] = None
+
+
+# 컬렉션별로 검색 결과의 text로 쓸 값: 메타데이터의 키 또는 None(문서)
+_CONTEXT_FIELDS = {
+    "experience": "context",
+    "case": "response_directions",
+    "legal": None,
+}
+
+
+def _shingles(text, size=3):
+    text = " ".join(text.split())
+    if len(text) <= size:
+        return {text}
+    return {text[i : i + size] for i in range(len(text) - size + 1)}
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def pack_context(hits, max_chars=1500):
+    """
+    검색 결과를 가까운 순서대로 번호를 붙여 max_chars 이하의 문맥 블록으로 묶습니다.
+    예산을 넘는 결과는 넣지 않으며, 첫 결과가 예산보다 길면 잘라서 넣습니다.
+    :param hits: MemoryHit 리스트
+    :param max_chars: 블록의 최대 글자 수(None이면 제한하지 않음)
+    :return: 문맥 문자열(결과가 없으면 빈 문자열)
+    """
+    if len(hits) == 1:
+        lines = [hits[0].text]
+    else:
+        lines = [f"{i}. {hit.text}" for i, hit in enumerate(hits, 1)]
+    if max_chars is None:
+        return "\n".join(lines)
+
+    packed, used = [], 0
+    for line in lines:
+        needed = len(line) + (1 if packed else 0)
+        if used + needed > max_chars:
+            if not packed:
+                packed.append(line[: max(max_chars - 1, 0)] + "…")
+            break
+        packed.append(line)
+        used += needed
+    return "\n".join(packed)
+
+
+STORE_MODES = ("per_agent", "shared")
+BACKENDS = ("chroma", "numpy")
+# 새 컬렉션의 설정. chroma의 기본값(L2) 대신 numpy 백엔드와 같은 코사인 거리를 사용합니다.
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def open_client(path, backend="chroma"):
+    """
+    path에 저장소 클라이언트를 엽니다.
+    :param backend: "chroma"(chromadb PersistentClient) 또는 "numpy"(NumpyClient)
+    """
+    os.makedirs(path, exist_ok=True)
+    if backend == "numpy":
+        from .numpy_store import NumpyClient
+
+        return NumpyClient(path)
+
+    import chromadb
+
+    return chromadb.PersistentClient(path=path)
+
+
+def get_shared_client(path="db/shared", backend="chroma"):
+    """
+    경로별로 하나의 클라이언트를 반환합니다. shared 모드의 모든 에이전트가
+    이 클라이언트 하나에 이름공간이 붙은 컬렉션을 만들어 SQLite 파일, 인덱스, 백그라운드 스레드를 공유합니다.
+    """
+    key = (os.path.abspath(path), backend)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = open_client(key[0], backend)
+        return client
 
 
 class db:
-    def __init__(self, agent_name, EmbeddingModelName="BAAI/bge-m3", device="cpu"):
+    def __init__(
+        self,
+        agent_name,
+        EmbeddingModelName="BAAI/bge-m3",
+        device="cpu",
+        flush_size=32,
+        flush_interval=30.0,
+        store="per_agent",
+        store_path="db/shared",
+        backend="chroma",
+    ):
+        """
+        :param agent_name: 에이전트 이름. 저장소 경로와 컬렉션 이름에 쓰입니다.
+        :param flush_size: 컬렉션별 쓰기 버퍼가 이만큼 쌓이면 한 번의 add로 기록합니다.
+        :param flush_interval: 가장 오래된 버퍼 항목이 이 시간(초)보다 오래되면 기록합니다(None이면 사용하지 않음).
+        :param store: "per_agent"면 db/<agent_name>에 에이전트별 저장소를, "shared"면 store_path의 공유 저장소를 사용합니다.
+        :param store_path: shared 모드에서 사용할 공유 저장소 경로
+        :param backend: "chroma" 또는 "numpy"(메모리 매핑된 NumPy 배열에 저장하고 내적으로 검색)
+        """
+        if store not in STORE_MODES:
+            raise ValueError(f"Unsupported store mode: {store}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported memory backend: {backend}")
         self.agent_name = agent_name
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=EmbeddingModelName, device=device
-        )
-        self.client = self._create_client()
-        self.experience_collection = self._create_collection("experience")
-        self.case_collection = self._create_collection("case")
-        self.legal_collection = self._create_collection("legal")
+        self.store = store
+        self.store_path = store_path
+        self.backend = backend
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # 여러 사례가 동시에 진행될 때 같은 에이전트 저장소로의 쓰기를 직렬화합니다.
+        self.write_lock = threading.Lock()
+        # 컬렉션별로 아직 기록하지 않은 (id, 문서, 메타데이터)와 가장 오래된 항목의 시각
+        self._pending = {}
+        self._pending_since = {}
+        # 모든 db 인스턴스가 같은 임베딩 모델을 공유합니다.
+        self.embedding_service = get_embedding_service(EmbeddingModelName, device)
+        self.embedding_fn = self.embedding_service.embedding_function
+        # 클라이언트와 컬렉션은 처음 사용할 때 만듭니다. 기억을 조회하지 않는 에이전트(재판장)는
+        # 저장소를 열지 않습니다.
+        self._client = None
+        self._collections = {}
+        self._init_lock = threading.RLock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @property
+    def experience_collection(self):
+        return self._get_collection("experience")
+
+    @property
+    def case_collection(self):
+        return self._get_collection("case")
+
+    @property
+    def legal_collection(self):
+        return self._get_collection("legal")
 
     def _create_client(self):
+        # 컬렉션 이름에 에이전트 이름이 붙어 있으므로 공유 저장소에서도 서로 섞이지 않습니다.
+        if self.store == "shared":
+            return get_shared_client(self.store_path, self.backend)
+
         client_path = os.path.join("db", self.agent_name)
-        os.makedirs(client_path, exist_ok=True)
-        return chromadb.PersistentClient(path=client_path)
+        if self.backend == "numpy":
+            client_path = os.path.join(client_path, "numpy")
+        return open_client(client_path, self.backend)
+
+    def _get_collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            with self._init_lock:
+                collection = self._collections.get(collection_name)
+                if collection is None:
+                    collection = self._collections[collection_name] = (
+                        self._create_collection(collection_name)
+                    )
+        return collection
 
     def _create_collection(self, collection_name):
-        return self.client.get_or_create_collection(
+        # 두 백엔드 모두 코사인 거리(1 - 코사인 유사도)를 쓰므로 max_distance의 의미가 같습니다.
+        collection = self.client.get_or_create_collection(
             name=f"{self.agent_name}_{collection_name}",
             embedding_function=self.embedding_fn,
+            metadata=COLLECTION_METADATA,
         )
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if self.backend == "chroma" and space != "cosine":
+            # 이미 만들어진 chroma 컬렉션의 거리 공간은 바뀌지 않습니다.
+            logging.warning(
+                f"Collection {collection.name} uses {space} distance; "
+                "export and re-import a snapshot into a fresh store to switch to cosine"
+            )
+        return collection
 
     def add_to_experience(self, id, document, metadata=None):
-        self.experience_collection.add(
-            documents=[document], metadatas=[metadata] if metadata else None, ids=[id]
-        )
+        self._buffer("experience", id, document, metadata)
 
     def add_to_case(self, id, document, metadata=None):
-        self.case_collection.add(
-            documents=[document], metadatas=[metadata] if metadata else None, ids=[id]
-        )
+        self._buffer("case", id, document, metadata)
 
     def add_to_legal(self, id, document, metadata=None):
-        self.legal_collection.add(
-            documents=[document], metadatas=[metadata] if metadata else None, ids=[id]
+        self._buffer("legal", id, document, metadata)
+
+    def _buffer(self, collection_name, id, document, metadata):
+        # 기억 정리(MemoryConsolidator)의 보존 정책이 기록 시각을 사용합니다.
+        metadata = {**(metadata or {}), "created_at": time.time()}
+        with self.write_lock:
+            pending = self._pending.setdefault(collection_name, [])
+            if not pending:
+                self._pending_since[collection_name] = time.monotonic()
+            pending.append((id, document, metadata))
+            expired = (
+                self.flush_interval is not None
+                and time.monotonic() - self._pending_since[collection_name]
+                >= self.flush_interval
+            )
+            if len(pending) >= self.flush_size or expired:
+                self._flush_collection(collection_name)
+
+    def flush(self):
+        """
+        모든 컬렉션의 쓰기 버퍼를 기록합니다. 사례가 끝날 때 호출합니다.
+        """
+        with self.write_lock:
+            for collection_name in list(self._pending):
+                self._flush_collection(collection_name)
+
+    def _flush_collection(self, collection_name):
+        # write_lock을 잡은 상태에서 호출해야 합니다.
+        pending = self._pending.pop(collection_name, None)
+        self._pending_since.pop(collection_name, None)
+        if not pending:
+            return
+        # _buffer가 모든 항목에 created_at을 붙이므로 메타데이터가 없는 항목은 없습니다.
+        ids, documents, metadatas = zip(*pending)
+        self._get_collection(collection_name).add(
+            ids=list(ids), documents=list(documents), metadatas=list(metadatas)
         )
 
+    def _read_collection(self, collection_name):
+        """
+        조회용 컬렉션을 반환합니다. 같은 프로세스에서 쓴 항목이 조회 결과에 보이도록
+        해당 컬렉션의 버퍼가 남아 있으면 먼저 기록합니다.
+        """
+        if self._pending.get(collection_name):
+            with self.write_lock:
+                self._flush_collection(collection_name)
+        return self._get_collection(collection_name)
+
     def query_experience(self, query_text, n_results=5, include=["documents"]):
-        result = self.experience_collection.query(
+        result = self._read_collection("experience").query(
             query_texts=[query_text], n_results=n_results, include=include
         )
         documents = result.get("documents", [[]])[0]
         return documents[0] if documents else ""
 
     def query_experience_metadatas(self, query_text, n_results=5):
-        result = self.experience_collection.query(
+        result = self._read_collection("experience").query(
             query_texts=[query_text], n_results=n_results, include=["metadatas"]
         )
-        metadatas = result.get("metadatas", [[]])[0]
-
-        # "context" 키를 포함하는 첫 번째 딕셔너리를 찾습니다.
-        for metadata in metadatas:
-            if "context" in metadata:
-                return metadata["context"]
-
-        # 해당 키를 포함한 딕셔너리를 찾지 못하면 빈 문자열을 반환합니다.
-        return ""
+        return self._first_metadata_value(result, "context")
 
     def query_experience_documents(self, query_text, n_results=5):
-        result = self.experience_collection.query(
+        result = self._read_collection("experience").query(
             query_texts=[query_text], n_results=n_results, include=["documents"]
         )
         documents = result.get("documents", [[]])[0]
         return documents[0] if documents else ""
 
     def query_case(self, query_text, n_results=5, include=["documents"]):
-        result = self.case_collection.query(
+        result = self._read_collection("case").query(
             query_texts=[query_text], n_results=n_results, include=include
         )
         documents = result.get("documents", [[]])[0]
         return documents[0] if documents else ""
 
     def query_case_documents(self, query_text, n_results=5):
-        result = self.case_collection.query(
+        result = self._read_collection("case").query(
             query_texts=[query_text], n_results=n_results, include=["documents"]
         )
         documents = result.get("documents", [[]])[0]
         return documents[0] if documents else ""
 
     def query_case_metadatas(self, query_text, n_results=5):
-        result = self.case_collection.query(
+        result = self._read_collection("case").query(
             query_texts=[query_text], n_results=n_results, include=["metadatas"]
         )
-        metadatas = result.get("metadatas", [[]])[0]
-
-        # "response_directions" 키를 포함하는 첫 번째 딕셔너리를 찾습니다.
-        for metadata in metadatas:
-            if "response_directions" in metadata:
-                return metadata["response_directions"]
-
-        # 해당 키를 포함한 딕셔너리를 찾지 못하면 빈 문자열을 반환합니다.
-        return ""
+        return self._first_metadata_value(result, "response_directions")
 
     def query_legal(self, query_text, n_results=5, include=["documents"]):
-        result = self.legal_collection.query(
+        result = self._read_collection("legal").query(
             query_texts=[query_text], n_results=n_results, include=include
         )
         documents = result.get("documents", [[]])[0]
         return documents[0] if documents else ""
+
+    def search(
+        self,
+        collection_name,
+        query_text,
+        n_results=5,
+        max_distance=None,
+        dedupe_threshold=0.85,
+    ):
+        """
+        한 컬렉션에서 가까운 순서대로 정렬된 검색 결과를 반환합니다.
+        :param collection_name: "experience", "case", "legal" 중 하나
+        :param query_text: 질의문
+        :param n_results: 가져올 최대 결과 수
+        :param max_distance: 이 코사인 거리보다 먼 결과는 버립니다(None이면 버리지 않음)
+        :param dedupe_threshold: 앞선 결과와의 문자 3-gram 유사도가 이 값 이상이면 중복으로 보고 버립니다(None이면 사용하지 않음)
+        :return: MemoryHit 리스트
+        """
+        (embedding,) = self.embedding_service.encode([query_text])
+        return self._search(
+            collection_name, embedding, n_results, max_distance, dedupe_threshold
+        )
+
+    def search_all(self, queries, executor=None, **search_options):
+        """
+        여러 컬렉션을 한 번에 검색합니다. 질의문은 한 번의 배치로 임베딩하고,
+        executor가 주어지면 컬렉션 검색을 동시에 실행합니다.
+        :param queries: {"experience" | "case" | "legal": 질의문} 딕셔너리
+        :param executor: 컬렉션 검색을 실행할 concurrent.futures 실행기(None이면 순서대로 실행)
+        :param search_options: search와 같은 n_results, max_distance, dedupe_threshold
+        :return: {컬렉션 이름: MemoryHit 리스트}
+        """
+        names = [name for name in _CONTEXT_FIELDS if name in queries]
+        if not names:
+            return {}
+        embeddings = self.embedding_service.encode([queries[name] for name in names])
+
+        def search(name, embedding):
+            return self._search(name, embedding, **search_options)
+
+        if executor is None or len(names) == 1:
+            hits = [
+                search(name, embedding) for name, embedding in zip(names, embeddings)
+            ]
+        else:
+            futures = [
+                executor.submit(search, name, embedding)
+                for name, embedding in zip(names, embeddings)
+            ]
+            hits = [future.result() for future in futures]
+        return dict(zip(names, hits))
+
+    def query_all(self, queries, executor=None, max_chars=1500, **search_options):
+        """
+        search_all의 결과를 컬렉션별로 max_chars 이하의 문맥 블록으로 묶어 반환합니다.
+        :return: MemoryContext. 질의하지 않은 컬렉션의 값은 None입니다.
+        """
+        hits = self.search_all(queries, executor=executor, **search_options)
+        return MemoryContext(
+            **{name: pack_context(found, max_chars) for name, found in hits.items()}
+        )
+
+    def _search(
+        self,
+        collection_name,
+        embedding,
+        n_results=5,
+        max_distance=None,
+        dedupe_threshold=0.85,
+    ):
+        field = _CONTEXT_FIELDS[collection_name]
+        result = self._read_collection(collection_name).query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        ids = result.get("ids", [[]])[0]
+        documents = (result.get("documents") or [[]])[0]
+        metadatas = (result.get("metadatas") or [[]])[0] or [None] * len(ids)
+        distances = (result.get("distances") or [[]])[0] or [None] * len(ids)
+
+        hits, kept_shingles = [], []
+        for id, document, metadata, distance in zip(
+            ids, documents, metadatas, distances
+        ):
+            if max_distance is not None and distance is not None:
+                if distance > max_distance:
+                    # 결과는 거리순이므로 이후 결과도 모두 기준을 넘습니다.
+                    break
+            text = (metadata or {}).get(field) if field else document
+            if not text:
+                continue
+            if dedupe_threshold is not None:
+                shingles = _shingles(text)
+                if any(
+                    _jaccard(shingles, kept) >= dedupe_threshold
+                    for kept in kept_shingles
+                ):
+                    continue
+                kept_shingles.append(shingles)
+            hits.append(MemoryHit(id, text, distance, metadata))
+        return hits
+
+    @staticmethod
+    def _first_metadata_value(result, key):
+        metadatas = result.get("metadatas", [[]])[0]
+
+        # key를 포함하는 첫 번째 딕셔너리를 찾습니다.
+        for metadata in metadatas:
+            if metadata and key in metadata:
+                return metadata[key]
+
+        # 해당 키를 포함한 딕셔너리를 찾지 못하면 빈 문자열을 반환합니다.
+        return ""
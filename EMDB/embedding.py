@@ -0,0 +1,225 @@
+# EMDB/embedding.py
+
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from chromadb.api.types import Documents, Embeddings
+
+
+class EmbeddingService:
+    """
+    프로세스 전체에서 하나만 존재하는 스레드 안전 임베딩 서비스입니다.
+    여러 에이전트가 동시에 보낸 인코딩 요청을 모아 한 번의 forward pass로 처리합니다.
+    """
+
+    def __init__(
+        self,
+        model_name,
+        device="cpu",
+        max_batch_size=64,
+        batch_wait=0.005,
+        encoder=None,
+        cache=None,
+    ):
+        self.model_name = model_name
+        # 지정하면 인코딩 전에 EmbeddingCache에서 먼저 찾습니다.
+        self.cache = cache
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        # encoder를 지정하면(예: 벤치마크용 스텁) 모델을 불러오지 않습니다.
+        # 지정하지 않으면 첫 인코딩 요청이 올 때 모델을 불러옵니다.
+        self._encoder = encoder
+        self.embedding_function = SharedEmbeddingFunction(self)
+
+        self._stats_lock = threading.Lock()
+        self.service_hits = 0
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._worker = threading.Thread(
+            target=self._run, name=f"embedding-{model_name}", daemon=True
+        )
+        self._worker.start()
+
+    def encode(self, texts):
+        """
+        문장 목록을 임베딩합니다. 다른 스레드의 요청과 함께 배치로 묶일 수 있습니다.
+        캐시가 설정되어 있으면 캐시에 없는 문장만 인코딩하고 결과를 캐시에 저장합니다.
+        :param texts: 인코딩할 문장 목록
+        :return: 문장별 임베딩 목록
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._submit(texts)
+
+        embeddings = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # 같은 요청 안에서 반복되는 문장은 한 번만 인코딩합니다.
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = dict(zip(unique, self._submit(unique)))
+            self.cache.put_many(self.model_name, unique, [encoded[t] for t in unique])
+            for i in missing:
+                embeddings[i] = encoded[texts[i]]
+        return embeddings
+
+    def _submit(self, texts):
+        future = Future()
+        with self._cond:
+            self._pending.append((texts, future))
+            self._cond.notify()
+        return future.result()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 다른 에이전트의 요청이 합류할 수 있도록 잠시 기다립니다.
+            if self.batch_wait:
+                time.sleep(self.batch_wait)
+            with self._cond:
+                batch, size = [], 0
+                while self._pending and (
+                    not batch or size + len(self._pending[0][0]) <= self.max_batch_size
+                ):
+                    texts, future = self._pending.pop(0)
+                    batch.append((texts, future))
+                    size += len(texts)
+            self._encode_batch(batch, size)
+
+    def _load_encoder(self):
+        from chromadb.utils import embedding_functions
+
+        start = time.perf_counter()
+        encoder = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=self.model_name, device=self.device
+        )
+        logging.info(
+            f"Loaded embedding model {self.model_name} in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        return encoder
+
+    def _encode_batch(self, batch, size):
+        flat = [text for texts, _ in batch for text in texts]
+        try:
+            # 인코딩은 작업 스레드에서만 이루어지므로 잠금 없이 불러와도 됩니다.
+            if self._encoder is None:
+                self._encoder = self._load_encoder()
+            embeddings = self._encoder(flat)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self.requests += len(batch)
+            self.texts += size
+            self.batches += 1
+            self.batch_sizes[size] += 1
+
+        offset = 0
+        for texts, future in batch:
+            future.set_result(embeddings[offset : offset + len(texts)])
+            offset += len(texts)
+
+    def report(self):
+        """
+        공유 횟수와 배치 크기 통계를 반환합니다.
+        :return: 통계 딕셔너리
+        """
+        with self._stats_lock:
+            return {
+                "model_name": self.model_name,
+                "device": self.device,
+                "service_hits": self.service_hits,
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+                "max_batch_size": max(self.batch_sizes) if self.batch_sizes else 0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "cache": self.cache.report() if self.cache is not None else None,
+            }
+
+
+class SharedEmbeddingFunction:
+    """
+    chromadb 컬렉션이 EmbeddingService를 임베딩 함수로 사용할 수 있게 해 주는 어댑터입니다.
+    chromadb는 __call__(self, input) 시그니처만 확인하므로 EmbeddingFunction을 상속하지 않습니다.
+    덕분에 numpy 백엔드만 쓸 때는 chromadb를 불러오지 않습니다.
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    def __call__(self, input: "Documents") -> "Embeddings":
+        return self.service.encode(input)
+
+
+_services = {}
+_services_lock = threading.Lock()
+_default_cache = None
+
+
+def get_embedding_service(model_name="BAAI/bge-m3", device="cpu"):
+    """
+    모델 이름과 장치별로 하나의 EmbeddingService를 반환합니다. 모델은 첫 인코딩 요청 때 불러옵니다.
+    :param model_name: 임베딩 모델 이름
+    :param device: 실행 장치
+    :return: EmbeddingService 인스턴스
+    """
+    key = (model_name, device)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = EmbeddingService(
+                model_name, device=device, cache=_default_cache
+            )
+        else:
+            with service._stats_lock:
+                service.service_hits += 1
+        return service
+
+
+def register_embedding_service(service):
+    """
+    같은 모델 이름과 장치로 생성될 db들이 주어진 서비스를 사용하도록 등록합니다.
+    :param service: EmbeddingService 인스턴스
+    """
+    with _services_lock:
+        _services[(service.model_name, service.device)] = service
+
+
+def set_embedding_cache(cache):
+    """
+    이미 생성된 서비스와 이후에 생성될 서비스가 모두 주어진 EmbeddingCache를 사용하도록 합니다.
+    :param cache: EmbeddingCache 인스턴스 또는 None
+    """
+    global _default_cache
+    with _services_lock:
+        _default_cache = cache
+        for service in _services.values():
+            service.cache = cache
+
+
+def embedding_service_reports():
+    """
+    지금까지 생성된 모든 임베딩 서비스의 통계를 반환합니다.
+    """
+    with _services_lock:
+        services = list(_services.values())
+    return [service.report() for service in services]
@@ -0,0 +1,137 @@
+# EMDB/embedding_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    같은 문장이 공백이나 유니코드 표기만 달라도 같은 키를 갖도록 정규화합니다.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def make_embedding_key(model_name, text):
+    material = f"{model_name}\0{normalize_text(text)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    임베딩을 모델 이름과 정규화된 문장의 해시로 저장하는 2단계 캐시입니다.
+    자주 쓰는 항목은 메모리의 LRU에 두고, 모든 항목은 SQLite에 float32 배열로 저장하여
+    실행이 끝난 뒤에도 다시 인코딩하지 않도록 합니다.
+    """
+
+    def __init__(self, path="cache/embeddings.sqlite3", memory_entries=10000):
+        self.path = path
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_name, texts):
+        """
+        문장별 임베딩을 찾습니다. 캐시에 없는 문장의 자리는 None입니다.
+        """
+        keys = [make_embedding_key(model_name, text) for text in texts]
+        results = [None] * len(keys)
+        with self._lock:
+            missing = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+
+            if missing:
+                lookup = list({keys[i] for i in missing})
+                rows = {}
+                # SQLite의 변수 개수 제한을 넘지 않도록 나누어 조회합니다.
+                for start in range(0, len(lookup), 500):
+                    part = lookup[start : start + 500]
+                    placeholders = ", ".join("?" * len(part))
+                    rows.update(
+                        self._conn.execute(
+                            "SELECT key, vector FROM embeddings "
+                            f"WHERE key IN ({placeholders})",
+                            part,
+                        ).fetchall()
+                    )
+                for i in missing:
+                    blob = rows.get(keys[i])
+                    if blob is None:
+                        self.misses += 1
+                        continue
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    results[i] = vector.tolist()
+                    self._remember(keys[i], results[i])
+                    self.disk_hits += 1
+        return results
+
+    def put_many(self, model_name, texts, embeddings):
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = make_embedding_key(model_name, text)
+                vector = [float(value) for value in embedding]
+                self._remember(key, vector)
+                rows.append((key, model_name, array("f", vector).tobytes(), now))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def report(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "path": self.path,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "disk_entries": self._conn.execute(
+                    "SELECT COUNT(*) FROM embeddings"
+                ).fetchone()[0],
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,349 @@
+# EMDB/numpy_store.py
+
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class NumpyCollection:
+    """
+    정규화된 float32 임베딩을 메모리 매핑된 NumPy 배열에, 문서와 메타데이터를 JSONL 사이드카 파일에
+    저장하는 컬렉션입니다. 검색은 전체 행렬과 질의 벡터의 내적 한 번으로 이루어집니다.
+    EMDB.db가 사용하는 chromadb Collection의 메서드(add, upsert, query, get, update, delete, count)를 제공합니다.
+    거리는 코사인 거리(1 - 코사인 유사도)입니다.
+
+    사이드카 파일(entries.jsonl)은 추가 전용 로그이며, 각 줄은 다음 중 하나입니다.
+    - {"op": "add", "row": 행 번호, "id": ..., "document": ..., "metadata": ...}
+    - {"op": "update", "id": ..., "metadata": ...}
+    - {"op": "delete", "id": ...}
+
+    지운 행과 덮어쓴 로그 줄은 바로 회수하지 않습니다. 로그에서 살아 있는 항목에 해당하지 않는 줄의
+    비율이 compact_ratio를 넘으면(열 때와 쓰기 뒤에 확인) 살아 있는 행만 새 파일로 다시 씁니다.
+    """
+
+    def __init__(
+        self, path, name, embedding_function=None, metadata=None, compact_ratio=0.25
+    ):
+        self.path = path
+        self.name = name
+        self.metadata = metadata
+        self.compact_ratio = compact_ratio
+        self._embedding_function = embedding_function
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._entries_path = os.path.join(path, "entries.jsonl")
+        self._header_path = os.path.join(path, "header.json")
+
+        self._dim = None
+        self._capacity = 0
+        self._vectors = None
+        # 행 번호별 (id, 문서, 메타데이터). 지운 행은 None입니다.
+        self._rows = []
+        self._row_of = {}
+        # 행 번호별 살아 있는지 여부. 검색에서 지운 행을 걸러낼 때 사용합니다.
+        self._live = np.zeros(0, dtype=bool)
+        self._log_lines = 0
+        self._load()
+        self._maybe_compact()
+
+    # --- 저장 형식 --- #
+
+    def _load(self):
+        if os.path.exists(self._header_path):
+            with open(self._header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            self._dim = header["dim"]
+            self._capacity = header["capacity"]
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(self._capacity, self._dim),
+            )
+            self._live = np.zeros(self._capacity, dtype=bool)
+        if not os.path.exists(self._entries_path):
+            return
+        with open(self._entries_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._apply(json.loads(line))
+                    self._log_lines += 1
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "add":
+            row = entry["row"]
+            self._rows.extend([None] * (row + 1 - len(self._rows)))
+            self._rows[row] = (entry["id"], entry["document"], entry["metadata"])
+            self._row_of[entry["id"]] = row
+            self._live[row] = True
+        elif op == "update":
+            row = self._row_of.get(entry["id"])
+            if row is not None:
+                id, document, _ = self._rows[row]
+                self._rows[row] = (id, document, entry["metadata"])
+        elif op == "delete":
+            row = self._row_of.pop(entry["id"], None)
+            if row is not None:
+                self._rows[row] = None
+                self._live[row] = False
+
+    def _log(self, entries):
+        with open(self._entries_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        for entry in entries:
+            self._apply(entry)
+        self._log_lines += len(entries)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        stale = self._log_lines - len(self._row_of)
+        if stale and stale > self.compact_ratio * self._log_lines:
+            self.compact()
+
+    def compact(self):
+        """
+        살아 있는 행만 새 벡터 파일과 로그로 다시 써서 지운 행과 오래된 로그 줄을 회수합니다.
+        """
+        with self._lock:
+            if self._dim is None:
+                return
+            live_rows = np.flatnonzero(self._live[: len(self._rows)])
+            capacity = max(len(live_rows), 1024)
+            vectors_tmp = self._vectors_path + ".tmp"
+            entries_tmp = self._entries_path + ".tmp"
+            header_tmp = self._header_path + ".tmp"
+
+            vectors = np.memmap(
+                vectors_tmp, dtype=np.float32, mode="w+", shape=(capacity, self._dim)
+            )
+            for start in range(0, len(live_rows), 4096):
+                rows = live_rows[start : start + 4096]
+                vectors[start : start + len(rows)] = self._vectors[rows]
+            vectors.flush()
+            del vectors
+            entries = []
+            with open(entries_tmp, "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(live_rows):
+                    id, document, metadata = self._rows[row]
+                    entry = {
+                        "op": "add",
+                        "row": new_row,
+                        "id": id,
+                        "document": document,
+                        "metadata": metadata,
+                    }
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    entries.append(entry)
+            with open(header_tmp, "w", encoding="utf-8") as f:
+                json.dump({"dim": self._dim, "capacity": capacity}, f)
+
+            # 매핑을 닫아야 파일을 교체할 수 있습니다.
+            self._vectors.flush()
+            self._vectors = None
+            os.replace(vectors_tmp, self._vectors_path)
+            os.replace(header_tmp, self._header_path)
+            os.replace(entries_tmp, self._entries_path)
+
+            self._capacity = capacity
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r+",
+                shape=(capacity, self._dim),
+            )
+            self._rows = []
+            self._row_of = {}
+            self._live = np.zeros(capacity, dtype=bool)
+            for entry in entries:
+                self._apply(entry)
+            self._log_lines = len(entries)
+
+    def _reserve(self, rows, dim):
+        # 용량이 부족하면 두 배씩 늘려 파일을 다시 매핑합니다.
+        if self._dim is None:
+            self._dim = dim
+        elif dim != self._dim:
+            raise ValueError(
+                f"Embedding dimension {dim} does not match "
+                f"collection dimension {self._dim}"
+            )
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, 1024)
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._capacity = capacity
+        self._live = np.concatenate(
+            [self._live, np.zeros(capacity - len(self._live), dtype=bool)]
+        )
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim)
+        )
+        with open(self._header_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "capacity": capacity}, f)
+
+    @staticmethod
+    def _normalize(embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+    def _embed(self, documents):
+        if self._embedding_function is None:
+            raise ValueError(f"Collection {self.name} has no embedding function")
+        return self._embedding_function(documents)
+
+    # --- Collection API --- #
+
+    def count(self):
+        with self._lock:
+            return len(self._row_of)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        with self._lock:
+            duplicates = [id for id in ids if id in self._row_of]
+            if duplicates:
+                raise ValueError(f"IDs already exist in {self.name}: {duplicates[:5]}")
+        self.upsert(ids, documents, metadatas, embeddings)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            entries = [{"op": "delete", "id": id} for id in ids if id in self._row_of]
+            start = len(self._rows)
+            self._reserve(start + len(ids), vectors.shape[1])
+            self._vectors[start : start + len(ids)] = vectors
+            self._vectors.flush()
+            entries += [
+                {
+                    "op": "add",
+                    "row": start + i,
+                    "id": id,
+                    "document": document,
+                    "metadata": metadata,
+                }
+                for i, (id, document, metadata) in enumerate(
+                    zip(ids, documents, metadatas)
+                )
+            ]
+            self._log(entries)
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            self._log(
+                [
+                    {"op": "update", "id": id, "metadata": metadata}
+                    for id, metadata in zip(ids, metadatas)
+                    if id in self._row_of
+                ]
+            )
+
+    def delete(self, ids):
+        with self._lock:
+            self._log([{"op": "delete", "id": id} for id in ids if id in self._row_of])
+
+    def get(
+        self, ids=None, include=("documents", "metadatas"), offset=None, limit=None
+    ):
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[id] for id in ids if id in self._row_of]
+            else:
+                rows = np.flatnonzero(self._live[: len(self._rows)]).tolist()
+            rows = rows[offset or 0 :]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {"ids": [self._rows[row][0] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self._rows[row][1] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._rows[row][2] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = (
+                    np.array(self._vectors[rows]).tolist() if rows else []
+                )
+            return result
+
+    def query(
+        self,
+        query_embeddings=None,
+        query_texts=None,
+        n_results=10,
+        include=("documents", "metadatas", "distances"),
+    ):
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        queries = self._normalize(query_embeddings)
+        result = {key: [] for key in ["ids", *include]}
+        with self._lock:
+            count = len(self._rows)
+            if count == 0 or not self._row_of:
+                for _ in queries:
+                    for key in result:
+                        result[key].append([])
+                return result
+            similarities = queries @ self._vectors[:count].T
+            # 지운 행은 검색되지 않도록 가장 낮은 점수를 줍니다.
+            similarities[:, ~self._live[:count]] = -np.inf
+            k = min(n_results, len(self._row_of))
+            for scores in similarities:
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                result["ids"].append([self._rows[row][0] for row in top])
+                if "documents" in include:
+                    result["documents"].append([self._rows[row][1] for row in top])
+                if "metadatas" in include:
+                    result["metadatas"].append([self._rows[row][2] for row in top])
+                if "distances" in include:
+                    result["distances"].append(
+                        [float(1.0 - scores[row]) for row in top]
+                    )
+                if "embeddings" in include:
+                    result["embeddings"].append(np.array(self._vectors[top]).tolist())
+            return result
+
+
+class NumpyClient:
+    """
+    path 아래에 컬렉션별 디렉터리를 두는 NumpyCollection 저장소입니다.
+    chromadb PersistentClient 대신 EMDB.db의 backend="numpy"에서 사용합니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get_or_create_collection(self, name, embedding_function=None, metadata=None):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = NumpyCollection(
+                    os.path.join(self.path, name), name, embedding_function, metadata
+                )
+            elif embedding_function is not None:
+                collection._embedding_function = embedding_function
+            return collection
+
+    def list_collections(self):
+        names = sorted(
+            entry
+            for entry in os.listdir(self.path)
+            if os.path.isdir(os.path.join(self.path, entry))
+        )
+        return [self.get_or_create_collection(name) for name in names]
@@ -0,0 +1,139 @@
+# EMDB/snapshot.py
+
+import json
+import os
+import time
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+COLLECTIONS = ("experience", "case", "legal")
+PAGE_SIZE = 1000
+
+
+def export_snapshot(store, path):
+    """
+    에이전트의 세 컬렉션을 스냅숏 디렉터리로 내보냅니다.
+    컬렉션마다 임베딩은 <이름>.f32(float32 행렬)에, id, 문서, 메타데이터는 같은 순서로
+    <이름>.jsonl에 저장하고, 모델 이름과 차원, 항목 수는 manifest.json에 기록합니다.
+    :param store: 내보낼 EMDB.db 인스턴스
+    :param path: 스냅숏 디렉터리
+    :return: manifest 딕셔너리
+    """
+    store.flush()
+    os.makedirs(path, exist_ok=True)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "agent_name": store.agent_name,
+        "embedding_model": store.embedding_service.model_name,
+        "created_at": time.time(),
+        "dim": None,
+        "collections": {},
+    }
+    for name in COLLECTIONS:
+        collection = store._get_collection(name)
+        total = collection.count()
+        count = 0
+        with open(os.path.join(path, f"{name}.f32"), "wb") as vectors_file, open(
+            os.path.join(path, f"{name}.jsonl"), "w", encoding="utf-8"
+        ) as entries_file:
+            for offset in range(0, total, PAGE_SIZE):
+                page = collection.get(
+                    offset=offset,
+                    limit=PAGE_SIZE,
+                    include=["documents", "metadatas", "embeddings"],
+                )
+                if not len(page["ids"]):
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                manifest["dim"] = manifest["dim"] or int(vectors.shape[1])
+                vectors.tofile(vectors_file)
+                for id, document, metadata in zip(
+                    page["ids"], page["documents"], page["metadatas"]
+                ):
+                    entries_file.write(
+                        json.dumps(
+                            {"id": id, "document": document, "metadata": metadata},
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+                count += len(page["ids"])
+        manifest["collections"][name] = count
+
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+    return manifest
+
+
+def import_snapshot(store, path, allow_model_mismatch=False):
+    """
+    스냅숏을 store의 컬렉션에 불러옵니다. 저장된 임베딩을 그대로 사용하므로 임베딩 모델을
+    실행하지 않습니다. 같은 id의 항목은 덮어씁니다.
+    :param store: 불러올 EMDB.db 인스턴스(다른 에이전트 이름이어도 됩니다)
+    :param path: 스냅숏 디렉터리
+    :param allow_model_mismatch: 스냅숏과 저장소의 임베딩 모델이 달라도 불러올지 여부
+    :return: {컬렉션 이름: 불러온 항목 수}
+    """
+    manifest = read_manifest(path)
+    model_name = store.embedding_service.model_name
+    if manifest["embedding_model"] != model_name and not allow_model_mismatch:
+        raise ValueError(
+            f"Snapshot was embedded with {manifest['embedding_model']}, "
+            f"but the store uses {model_name}"
+        )
+
+    imported = {}
+    store.flush()
+    with store.write_lock:
+        for name, count in manifest["collections"].items():
+            if not count:
+                imported[name] = 0
+                continue
+            vectors = np.fromfile(
+                os.path.join(path, f"{name}.f32"), dtype=np.float32
+            ).reshape(count, manifest["dim"])
+            with open(os.path.join(path, f"{name}.jsonl"), "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if len(entries) != count:
+                raise ValueError(
+                    f"Snapshot {name} has {len(entries)} entries, expected {count}"
+                )
+
+            collection = store._get_collection(name)
+            for start in range(0, count, PAGE_SIZE):
+                _upsert(
+                    collection,
+                    entries[start : start + PAGE_SIZE],
+                    vectors[start : start + PAGE_SIZE],
+                )
+            imported[name] = count
+    return imported
+
+
+def _upsert(collection, entries, vectors):
+    # chromadb는 메타데이터가 있는 항목과 없는 항목을 한 번의 upsert에 섞을 수 없습니다.
+    for has_metadata in (True, False):
+        indices = [
+            i
+            for i, entry in enumerate(entries)
+            if bool(entry["metadata"]) == has_metadata
+        ]
+        if not indices:
+            continue
+        collection.upsert(
+            ids=[entries[i]["id"] for i in indices],
+            documents=[entries[i]["document"] for i in indices],
+            embeddings=vectors[indices].tolist(),
+            metadatas=(
+                [entries[i]["metadata"] for i in indices] if has_metadata else None
+            ),
+        )
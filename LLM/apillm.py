@@ -5,29 +5,70 @@ from .zhipuai_client import ZhipuAIClient
 
 
 class APILLM(LLM):
-    def __init__(self, api_key, api_secret=None, platform="wenxin", model="gpt-4"):
+    def __init__(
+        self,
+        api_key,
+        api_secret=None,
+        platform="wenxin",
+        model="gpt-4",
+        max_concurrency=8,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=5,
+    ):
         self.api_key = api_key
         self.api_secret = api_secret
         self.platform = platform
         self.model = model
+        self.max_concurrency = max_concurrency
+        # 같은 플랫폼의 모든 클라이언트가 공유하는 속도 제한 설정
+        self.client_options = {
+            "requests_per_minute": requests_per_minute,
+            "tokens_per_minute": tokens_per_minute,
+            "max_retries": max_retries,
+        }
         self.client = self._initialize_client()
 
     def _initialize_client(self):
         if self.platform == "openai":
-            return OpenAIClient(self.api_key, self.model)
+            return OpenAIClient(
+                self.api_key, self.model, self.max_concurrency, **self.client_options
+            )
         elif self.platform == "wenxin":
-            return WenxinClient(self.api_key, self.api_secret, self.model)
+            return WenxinClient(
+                self.api_key,
+                self.api_secret,
+                self.model,
+                self.max_concurrency,
+                **self.client_options,
+            )
         elif self.platform == "zhipuai":
-            return ZhipuAIClient(self.api_key, self.model)
+            return ZhipuAIClient(
+                self.api_key, self.model, self.max_concurrency, **self.client_options
+            )
         else:
             raise ValueError(f"Unsupported platform: {self.platform}")
 
-    def generate(self, instruction, prompt, *args, **kwargs):
+    def _build_messages(self, instruction, prompt):
         if instruction is None:
             instruction = "You are a helpful assistant."
 
-        messages = [
+        return [
             {"role": "system", "content": instruction},
             {"role": "user", "content": prompt},
         ]
+
+    def generate(self, instruction, prompt, *args, **kwargs):
+        messages = self._build_messages(instruction, prompt)
         return self.client.send_request(messages, *args, **kwargs)
+
+    def generation_defaults(self):
+        return self.client.generation_defaults()
+
+    async def agenerate(self, instruction, prompt, *args, **kwargs):
+        messages = self._build_messages(instruction, prompt)
+        return await self.client.asend_request(messages, *args, **kwargs)
+
+    def stream_generate(self, instruction, prompt, *args, **kwargs):
+        messages = self._build_messages(instruction, prompt)
+        yield from self.client.stream_request(messages, *args, **kwargs)
@@ -1,9 +1,302 @@
 # LLM/base_client.py
+import asyncio
+import inspect
+import json
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .context import note_retry, note_usage
+from .rate_limit import (
+    RETRYABLE_STATUS,
+    backoff_delay,
+    get_rate_limiter,
+    parse_retry_after,
+)
+from .session_manager import get_session_manager
+from .tokens import estimate_tokens
+
+
+# generation_defaults가 보고하는 build_request 매개변수
+SAMPLING_PARAMETERS = (
+    "temperature",
+    "top_p",
+    "penalty_score",
+    "do_sample",
+    "max_tokens",
+    "max_output_tokens",
+)
+
+
+class LLMRequestError(RuntimeError):
+    pass
 
 
 class BaseClient(ABC):
+    """
+    HTTP 기반 LLM 클라이언트의 공통 부분입니다.
+    하위 클래스는 요청 생성(build_request)과 응답 해석(parse_response)만 구현하면
+    keep-alive 연결 풀을 사용하는 동기 send_request와 비동기 asend_request를 모두 얻습니다.
+    HTTP 세션과 접근 토큰은 SessionManager를 통해 같은 플랫폼의 모든 클라이언트가 공유합니다.
+    요청은 플랫폼별 RateLimiter를 거치며, 속도 제한이나 일시적 오류는 지터가 있는 지수 백오프로 재시도합니다.
+    """
+
+    platform = None
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.session_manager = get_session_manager()
+        self.rate_limiter = get_rate_limiter(
+            self.platform, requests_per_minute, tokens_per_minute
+        )
+        self._sync_limit = threading.BoundedSemaphore(max_concurrency)
+        # asyncio 세마포어는 이벤트 루프에 묶이므로 루프마다 따로 둡니다.
+        self._async_limits = {}
+
     @abstractmethod
-    def send_request(self, messages: List[Dict[str, str]], *args, **kwargs):
+    def build_request(
+        self, messages: List[Dict[str, str]], *args, **kwargs
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """
+        요청 URL, 헤더, 페이로드를 만듭니다.
+        """
+        pass
+
+    @abstractmethod
+    def parse_response(self, text: Dict[str, Any]) -> str:
+        """
+        JSON 응답 본문에서 생성된 텍스트를 꺼냅니다.
+        """
+        pass
+
+    async def abuild_request(
+        self, messages: List[Dict[str, str]], *args, **kwargs
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        return self.build_request(messages, *args, **kwargs)
+
+    def is_rate_limited_body(self, text: Dict[str, Any]) -> bool:
+        """
+        HTTP 200이지만 본문에 속도 제한 오류가 담긴 응답이면 True를 반환합니다.
+        """
+        return False
+
+    def generation_defaults(self) -> Dict[str, Any]:
+        """
+        build_request의 샘플링 관련 기본값을 반환합니다.
+        """
+        return {
+            name: parameter.default
+            for name, parameter in inspect.signature(
+                self.build_request
+            ).parameters.items()
+            if name in SAMPLING_PARAMETERS
+            and parameter.default is not inspect.Parameter.empty
+        }
+
+    def is_auth_expired_body(self, text: Dict[str, Any]) -> bool:
+        """
+        접근 토큰이 만료되었거나 유효하지 않다는 오류 본문이면 True를 반환합니다.
+        True이면 invalidate_credentials를 호출하고 새 토큰으로 요청을 한 번 다시 만듭니다.
+        """
+        return False
+
+    def invalidate_credentials(self):
+        """
+        캐시된 접근 토큰을 버려 다음 build_request에서 새로 발급받게 합니다.
+        """
         pass
+
+    def _credentials_expired(self, text):
+        if isinstance(text, dict) and self.is_auth_expired_body(text):
+            self.invalidate_credentials()
+            return True
+        return False
+
+    def retry_delay(self, status_code, headers, text, attempt) -> Optional[float]:
+        """
+        재시도가 필요하면 대기할 초 수를, 아니면 None을 반환합니다.
+        속도 제한에 걸리면 같은 플랫폼의 다른 작업자도 함께 기다리도록 제한기를 일시 정지합니다.
+        """
+        rate_limited = status_code == 429 or (
+            isinstance(text, dict) and self.is_rate_limited_body(text)
+        )
+        if not rate_limited and status_code not in RETRYABLE_STATUS:
+            return None
+        if attempt >= self.max_retries:
+            raise LLMRequestError(
+                f"{self.platform} request failed after {attempt + 1} attempts "
+                f"(status {status_code}): {text}"
+            )
+        delay = backoff_delay(attempt, parse_retry_after(headers))
+        if rate_limited:
+            self.rate_limiter.pause(delay)
+        return delay
+
+    def _estimate_request_tokens(self, payload):
+        return sum(
+            estimate_tokens(message.get("content", ""))
+            for message in payload.get("messages", [])
+        ) + estimate_tokens(payload.get("system", ""))
+
+    def _finish(self, estimated_tokens, text):
+        if not isinstance(text, dict):
+            raise LLMRequestError(f"{self.platform} returned a non-JSON body: {text}")
+        usage = text.get("usage")
+        note_usage(usage)
+        if isinstance(usage, dict):
+            self.rate_limiter.settle(estimated_tokens, usage.get("total_tokens"))
+        return self.parse_response(text)
+
+    @staticmethod
+    def _decode(body):
+        try:
+            return json.loads(body)
+        except (TypeError, ValueError):
+            return body
+
+    # --- Sync --- #
+
+    @property
+    def session(self) -> requests.Session:
+        return self.session_manager.get_session(self.platform, self.max_concurrency)
+
+    def _post(self, url, headers, payload, estimated_tokens, stream=False):
+        """
+        속도 제한과 재시도를 적용하여 요청을 보냅니다.
+        :return: (응답 객체, 디코딩된 본문). 이벤트 스트림 응답이면 본문은 None입니다.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(estimated_tokens)
+            with self._sync_limit:
+                try:
+                    response = self.session.post(
+                        url, headers=headers, data=json.dumps(payload), stream=stream
+                    )
+                    status_code = response.status_code
+                    response_headers = response.headers
+                    text = None
+                    if not stream or not self._is_event_stream(response_headers):
+                        text = self._decode(response.text)
+                except requests.ConnectionError as e:
+                    response = None
+                    status_code, response_headers, text = 503, None, str(e)
+            self.rate_limiter.update_from_headers(response_headers)
+            delay = self.retry_delay(status_code, response_headers, text, attempt)
+            if delay is None:
+                return response, text
+            if response is not None:
+                response.close()
+            note_retry()
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _is_event_stream(headers):
+        return "text/event-stream" in (headers or {}).get("Content-Type", "")
+
+    def send_request(self, messages: List[Dict[str, str]], *args, **kwargs):
+        # 토큰이 만료되었다는 응답을 받으면 새 토큰으로 요청을 한 번만 다시 보냅니다.
+        for refreshed in (False, True):
+            url, headers, payload = self.build_request(messages, *args, **kwargs)
+            estimated_tokens = self._estimate_request_tokens(payload)
+            _, text = self._post(url, headers, payload, estimated_tokens)
+            if refreshed or not self._credentials_expired(text):
+                break
+        return self._finish(estimated_tokens, text)
+
+    def parse_stream_event(self, event: Dict[str, Any]) -> Optional[str]:
+        """
+        스트리밍 응답의 이벤트 하나에서 새로 생성된 텍스트 조각을 꺼냅니다.
+        """
+        return None
+
+    def stream_request(self, messages: List[Dict[str, str]], *args, **kwargs):
+        """
+        stream=True로 요청을 보내고, 서버가 보내는 텍스트 조각을 도착하는 대로 반환하는 제너레이터입니다.
+        서버가 이벤트 스트림 대신 일반 JSON 응답을 돌려주면 전체 텍스트를 한 번에 반환합니다.
+        """
+        for refreshed in (False, True):
+            url, headers, payload = self.build_request(messages, *args, **kwargs)
+            payload["stream"] = True
+            estimated_tokens = self._estimate_request_tokens(payload)
+            response, text = self._post(
+                url, headers, payload, estimated_tokens, stream=True
+            )
+            if refreshed or not self._credentials_expired(text):
+                break
+        if text is not None:
+            yield self._finish(estimated_tokens, text)
+            return
+
+        with response:
+            response.encoding = response.encoding or "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                event = self._decode(data)
+                if not isinstance(event, dict):
+                    continue
+                if event.get("usage"):
+                    note_usage(event["usage"])
+                chunk = self.parse_stream_event(event)
+                if chunk:
+                    yield chunk
+
+    # --- Async --- #
+
+    def _get_async_state(self):
+        loop = asyncio.get_running_loop()
+        limit = self._async_limits.get(loop)
+        if limit is None:
+            limit = self._async_limits[loop] = asyncio.Semaphore(self.max_concurrency)
+        session = self.session_manager.get_async_session(
+            self.platform, self.max_concurrency
+        )
+        return session, limit
+
+    async def asend_request(self, messages: List[Dict[str, str]], *args, **kwargs):
+        import aiohttp
+
+        session, limit = self._get_async_state()
+        for refreshed in (False, True):
+            url, headers, payload = await self.abuild_request(
+                messages, *args, **kwargs
+            )
+            estimated_tokens = self._estimate_request_tokens(payload)
+            attempt = 0
+            while True:
+                await self.rate_limiter.aacquire(estimated_tokens)
+                async with limit:
+                    try:
+                        async with session.post(
+                            url, headers=headers, data=json.dumps(payload)
+                        ) as response:
+                            status_code = response.status
+                            response_headers = response.headers
+                            text = self._decode(await response.text())
+                    except aiohttp.ClientConnectionError as e:
+                        status_code, response_headers, text = 503, None, str(e)
+                self.rate_limiter.update_from_headers(response_headers)
+                delay = self.retry_delay(status_code, response_headers, text, attempt)
+                if delay is None:
+                    break
+                note_retry()
+                attempt += 1
+                await asyncio.sleep(delay)
+            if refreshed or not self._credentials_expired(text):
+                break
+        return self._finish(estimated_tokens, text)
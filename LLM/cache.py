@@ -0,0 +1,215 @@
+# LLM/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .llm import LLM
+
+CACHE_MODES = ("readwrite", "readonly", "refresh")
+
+
+def make_cache_key(
+    platform, model, instruction, prompt, args=(), kwargs=None, defaults=None
+):
+    """
+    플랫폼, 모델, 지시문, 프롬프트, 샘플링 매개변수를 합쳐 내용 기반 키를 만듭니다.
+    defaults는 백엔드에 설정된 생성 기본값(LLM.generation_defaults)입니다.
+    """
+    material = json.dumps(
+        {
+            "platform": platform,
+            "model": model,
+            "instruction": instruction,
+            "prompt": prompt,
+            "args": list(args),
+            "kwargs": kwargs or {},
+            "defaults": defaults or {},
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CachedLLM(LLM):
+    """
+    LLM 응답을 SQLite에 저장해 두고 같은 요청을 디스크에서 재생하는 래퍼입니다.
+    - readwrite: 캐시에 있으면 재생하고, 없으면 호출한 뒤 저장합니다.
+    - readonly: 캐시에 있으면 재생하고, 없으면 호출만 하고 저장하지 않습니다.
+    - refresh: 항상 호출하고 결과로 캐시를 덮어씁니다.
+    전체 응답 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다.
+    """
+
+    def __init__(
+        self,
+        llm,
+        path="cache/llm_cache.sqlite3",
+        mode="readwrite",
+        max_bytes=1 << 30,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported cache mode: {mode}")
+        self.llm = llm
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.platform = getattr(llm, "platform", type(llm).__name__)
+        self.model = getattr(llm, "model", None)
+        # 백엔드의 max_new_tokens 같은 기본값이 바뀌면 다른 키가 되도록 키에 포함합니다.
+        self.defaults = llm.generation_defaults() if isinstance(llm, LLM) else {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def generation_defaults(self):
+        return self.defaults
+
+    def _key(self, instruction, prompt, args, kwargs):
+        return make_cache_key(
+            self.platform, self.model, instruction, prompt, args, kwargs, self.defaults
+        )
+
+    def _lookup(self, key):
+        if self.mode == "refresh":
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.mode != "readonly":
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._conn.commit()
+            return row[0]
+
+    def _store(self, key, response):
+        # 빈 응답은 오류 응답(예: result가 없는 Wenxin 응답)일 수 있으므로 저장하지 않습니다.
+        # 요청이 예외로 실패하면 이 메서드까지 오지 않습니다.
+        if self.mode == "readonly" or not isinstance(response, str):
+            return
+        if not response.strip():
+            return
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # 용량의 90% 아래로 내려갈 때까지 가장 오래 사용되지 않은 항목부터 지웁니다.
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def generate(self, instruction, prompt, *args, **kwargs):
+        key = self._key(instruction, prompt, args, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = self.llm.generate(instruction, prompt, *args, **kwargs)
+        self._store(key, response)
+        return response
+
+    async def agenerate(self, instruction, prompt, *args, **kwargs):
+        key = self._key(instruction, prompt, args, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = await self.llm.agenerate(instruction, prompt, *args, **kwargs)
+        self._store(key, response)
+        return response
+
+    def generate_batch(self, requests, *args, **kwargs):
+        keys = [
+            self._key(instruction, prompt, args, kwargs)
+            for instruction, prompt in requests
+        ]
+        responses = [self._lookup(key) for key in keys]
+        # 캐시에 없는 요청만 모아 한 번의 배치로 생성합니다.
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            generated = self.llm.generate_batch(
+                [requests[i] for i in missing], *args, **kwargs
+            )
+            for i, response in zip(missing, generated):
+                responses[i] = response
+                self._store(keys[i], response)
+        return responses
+
+    def stream_generate(self, instruction, prompt, *args, **kwargs):
+        key = self._key(instruction, prompt, args, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in self.llm.stream_generate(instruction, prompt, *args, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        # 스트림이 끝까지 소비된 경우에만 전체 응답을 저장합니다.
+        self._store(key, "".join(chunks))
+
+    def report(self):
+        """
+        캐시 적중 통계를 반환합니다.
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,56 @@
+# LLM/context.py
+import contextvars
+from contextlib import contextmanager
+
+# 현재 LLM 호출을 설명하는 태그(case, agent, role, phase 등)
+_tags = contextvars.ContextVar("llm_tags", default={})
+# 계측 중인 호출의 기록. 클라이언트가 재시도 횟수와 토큰 사용량을 채웁니다.
+_current_call = contextvars.ContextVar("llm_current_call", default=None)
+
+
+@contextmanager
+def llm_tags(**tags):
+    """
+    블록 안에서 이루어지는 LLM 호출에 태그를 붙입니다. 바깥 태그와 합쳐지며 안쪽 값이 우선합니다.
+    """
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags():
+    return dict(_tags.get())
+
+
+@contextmanager
+def track_call(record):
+    token = _current_call.set(record)
+    try:
+        yield record
+    finally:
+        _current_call.reset(token)
+
+
+def note_retry():
+    """
+    현재 호출에서 재시도가 한 번 일어났음을 기록합니다.
+    """
+    record = _current_call.get()
+    if record is not None:
+        record["retries"] += 1
+
+
+def note_usage(usage):
+    """
+    API 응답의 usage 필드(prompt_tokens, completion_tokens)를 현재 호출에 기록합니다.
+    """
+    record = _current_call.get()
+    if record is None or not isinstance(usage, dict):
+        return
+    if usage.get("prompt_tokens") is not None:
+        record["prompt_tokens"] = usage["prompt_tokens"]
+    if usage.get("completion_tokens") is not None:
+        record["completion_tokens"] = usage["completion_tokens"]
+    record["token_source"] = "usage"
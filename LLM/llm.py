@@ -1,10 +1,31 @@
 # LLM/llm.py:
+import asyncio
 from abc import ABC, abstractmethod
-import requests
-from transformers import AutoModelForCausalLM, AutoTokenizer
 
 
 class LLM(ABC):
     @abstractmethod
     def generate(self, prompt,*args, **kwargs):
         pass
+
+    async def agenerate(self, *args, **kwargs):
+        # 비동기 구현이 없는 백엔드는 스레드에서 동기 generate를 실행합니다.
+        return await asyncio.to_thread(self.generate, *args, **kwargs)
+
+    def stream_generate(self, *args, **kwargs):
+        # 스트리밍을 지원하지 않는 백엔드는 전체 응답을 조각 하나로 반환합니다.
+        yield self.generate(*args, **kwargs)
+
+    def generation_defaults(self):
+        """
+        호출마다 넘기지 않아도 적용되는 생성 설정(최대 토큰 수, 샘플링 매개변수 등)을 반환합니다.
+        응답 캐시는 이 값을 키에 넣어 설정이 바뀌면 이전 응답을 재사용하지 않습니다.
+        """
+        return {}
+
+    def generate_batch(self, requests, *args, **kwargs):
+        # 배치 생성을 지원하지 않는 백엔드는 요청을 하나씩 처리합니다.
+        return [
+            self.generate(instruction, prompt, *args, **kwargs)
+            for instruction, prompt in requests
+        ]
@@ -0,0 +1,208 @@
+# LLM/metrics.py
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from .context import current_tags, track_call
+from .llm import LLM
+from .tokens import estimate_tokens
+
+
+class MetricsRecorder:
+    """
+    LLM 호출별 지표를 모아 JSONL과 Prometheus 텍스트 형식으로 내보냅니다.
+    JSONL에는 호출마다 한 줄씩 바로 기록하고, Prometheus 파일은 (agent, role, phase)별 누계로 씁니다.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._totals = defaultdict(
+            lambda: {
+                "calls": 0,
+                "errors": 0,
+                "seconds": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "retries": 0,
+            }
+        )
+        for path in (jsonl_path, prometheus_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def record(self, record):
+        labels = (record.get("agent"), record.get("role"), record.get("phase"))
+        with self._lock:
+            totals = self._totals[labels]
+            totals["calls"] += 1
+            totals["errors"] += 1 if record["error"] else 0
+            totals["seconds"] += record["wall_time"]
+            totals["prompt_tokens"] += record["prompt_tokens"] or 0
+            totals["completion_tokens"] += record["completion_tokens"] or 0
+            totals["retries"] += record["retries"]
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        with self._lock:
+            return {labels: dict(totals) for labels, totals in self._totals.items()}
+
+    def prometheus_text(self):
+        metrics = [
+            ("llm_calls_total", "counter", "LLM calls", "calls"),
+            ("llm_call_errors_total", "counter", "Failed LLM calls", "errors"),
+            ("llm_call_seconds_total", "counter", "Wall time spent in LLM calls", "seconds"),
+            ("llm_prompt_tokens_total", "counter", "Prompt tokens", "prompt_tokens"),
+            ("llm_completion_tokens_total", "counter", "Completion tokens", "completion_tokens"),
+            ("llm_retries_total", "counter", "Retried LLM requests", "retries"),
+        ]
+        summary = self.summary()
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (agent, role, phase), totals in sorted(summary.items(), key=str):
+                labels = ",".join(
+                    f'{key}="{_escape(value)}"'
+                    for key, value in (("agent", agent), ("role", role), ("phase", phase))
+                )
+                lines.append(f"{name}{{{labels}}} {totals[field]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        path = path or self.prometheus_path
+        if not path:
+            return
+        # 여러 사례 스레드가 동시에 쓰면 같은 임시 파일을 서로 옮겨 버리므로 쓰기를 직렬화합니다.
+        # 잠근 뒤에 누계를 읽어 먼저 읽은 오래된 값이 새 값을 덮어쓰지 않게 합니다.
+        with self._write_lock:
+            text = self.prometheus_text()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+
+def _escape(value):
+    return str(value if value is not None else "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+class InstrumentedLLM(LLM):
+    """
+    모든 호출의 소요 시간, 프롬프트/응답 토큰 수, 재시도, 오류를 기록하는 래퍼입니다.
+    호출에는 llm_tags로 설정된 case, agent, role, phase 태그가 붙습니다.
+    토큰 수는 API 응답의 usage 값을 우선 사용하고, 없으면 추정합니다.
+    """
+
+    def __init__(self, llm, recorder):
+        self.llm = llm
+        self.recorder = recorder
+        self.platform = getattr(llm, "platform", type(llm).__name__)
+        self.model = getattr(llm, "model", None)
+
+    def _new_record(self, instruction, prompt):
+        record = {
+            "timestamp": time.time(),
+            **current_tags(),
+            "platform": self.platform,
+            "model": self.model,
+            "wall_time": 0.0,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "token_source": "estimate",
+            "retries": 0,
+            "error": None,
+        }
+        record["_prompt_estimate"] = estimate_tokens(instruction or "") + estimate_tokens(
+            prompt or ""
+        )
+        return record
+
+    def _finish(self, record, start, response, error):
+        record["wall_time"] = time.perf_counter() - start
+        prompt_estimate = record.pop("_prompt_estimate")
+        if record["prompt_tokens"] is None:
+            record["prompt_tokens"] = prompt_estimate
+        if record["completion_tokens"] is None:
+            record["completion_tokens"] = (
+                estimate_tokens(response) if isinstance(response, str) else 0
+            )
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        self.recorder.record(record)
+
+    def generation_defaults(self):
+        return self.llm.generation_defaults()
+
+    def generate(self, instruction, prompt, *args, **kwargs):
+        record = self._new_record(instruction, prompt)
+        start = time.perf_counter()
+        response, error = None, None
+        with track_call(record):
+            try:
+                response = self.llm.generate(instruction, prompt, *args, **kwargs)
+                return response
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(record, start, response, error)
+
+    async def agenerate(self, instruction, prompt, *args, **kwargs):
+        record = self._new_record(instruction, prompt)
+        start = time.perf_counter()
+        response, error = None, None
+        with track_call(record):
+            try:
+                response = await self.llm.agenerate(instruction, prompt, *args, **kwargs)
+                return response
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(record, start, response, error)
+
+    def generate_batch(self, requests, *args, **kwargs):
+        # 배치는 하나의 호출로 기록하고, 토큰 수는 모든 요청의 합입니다.
+        record = self._new_record(
+            "".join(instruction or "" for instruction, _ in requests),
+            "".join(prompt or "" for _, prompt in requests),
+        )
+        record["batch_size"] = len(requests)
+        start = time.perf_counter()
+        responses, error = None, None
+        with track_call(record):
+            try:
+                responses = self.llm.generate_batch(requests, *args, **kwargs)
+                return responses
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(record, start, "".join(responses or []), error)
+
+    def stream_generate(self, instruction, prompt, *args, **kwargs):
+        record = self._new_record(instruction, prompt)
+        record["first_chunk_time"] = None
+        start = time.perf_counter()
+        chunks, error = [], None
+        with track_call(record):
+            try:
+                for chunk in self.llm.stream_generate(
+                    instruction, prompt, *args, **kwargs
+                ):
+                    if record["first_chunk_time"] is None:
+                        record["first_chunk_time"] = time.perf_counter() - start
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(record, start, "".join(chunks), error)
@@ -1,26 +1,228 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import logging
+import threading
+
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    TextIteratorStreamer,
+    pipeline,
+)
+from .context import current_tags
 from .llm import LLM
+from .prefix_cache import PrefixCache
 import torch
 
+QUANTIZE_MODES = (None, "int8")
+
 
 class OfflineLLM(LLM):
-    def __init__(self, model_path, device="cuda"):
-        self.pipe = pipeline(
+    platform = "offline"
+
+    def __init__(
+        self,
+        model_path,
+        device="auto",
+        batch_size=8,
+        max_new_tokens=500,
+        prefix_cache_bytes=None,
+        quantize=None,
+        num_threads=None,
+    ):
+        """
+        :param model_path: Hugging Face 모델 이름 또는 로컬 경로
+        :param device: "cuda", "cpu" 또는 "auto"(CUDA가 있으면 cuda, 없으면 cpu)
+        :param batch_size: generate_batch가 한 번에 모델에 넣는 최대 프롬프트 수
+        :param max_new_tokens: 생성할 최대 토큰 수의 기본값
+        :param prefix_cache_bytes: 사례/에이전트별 접두사 KV 캐시의 메모리 상한(None이면 사용하지 않음)
+        :param quantize: "int8"이면 CPU에서 Linear 층을 int8 동적 양자화합니다(None이면 양자화하지 않음)
+        :param num_threads: CPU 추론에 사용할 스레드 수(None이면 PyTorch 기본값)
+        """
+        if quantize not in QUANTIZE_MODES:
+            raise ValueError(f"Unsupported quantize mode: {quantize}")
+        self.model = model_path
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.quantize = quantize
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.device = self.select_device(device)
+        try:
+            self.pipe = self._load_pipeline(self.device)
+        except (RuntimeError, ValueError) as e:
+            # GPU 메모리 부족이나 드라이버 문제로 CUDA 로딩에 실패하면 CPU로 다시 시도합니다.
+            if self.device == "cpu":
+                raise
+            logging.warning(
+                f"Loading {model_path} on {self.device} failed ({e}), "
+                "falling back to CPU"
+            )
+            self.device = "cpu"
+            self.pipe = self._load_pipeline(self.device)
+
+        self.tokenizer = self.pipe.tokenizer
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.prefix_cache = (
+            PrefixCache(prefix_cache_bytes) if prefix_cache_bytes else None
+        )
+
+    @staticmethod
+    def select_device(device):
+        if device == "auto":
+            return "cuda" if torch.cuda.is_available() else "cpu"
+        if device.startswith("cuda") and not torch.cuda.is_available():
+            logging.warning("CUDA is not available, falling back to CPU")
+            return "cpu"
+        return device
+
+    def _load_pipeline(self, device):
+        # CPU에서는 float16 연산이 느리거나 지원되지 않으므로 float32를 사용합니다.
+        torch_dtype = torch.float16 if device.startswith("cuda") else torch.float32
+        pipe = pipeline(
             "text-generation",
-            model=model_path,
-            torch_dtype=torch.float16,
+            model=self.model,
+            torch_dtype=torch_dtype,
             device_map=device,
         )
+        if self.quantize == "int8":
+            if device != "cpu":
+                logging.warning("int8 dynamic quantization is CPU-only, skipping")
+            else:
+                # Linear 층의 가중치를 int8로 바꾸고 활성값은 실행 시점에 양자화합니다.
+                torch.quantization.quantize_dynamic(
+                    pipe.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+        return pipe
 
-    def generate(self, instruction, prompt, max_new_tokens=500):
-
+    def _build_messages(self, instruction, prompt):
         if instruction is None:
             instruction = "You are a helpful assistant."
 
-        messages = [
+        return [
             {"role": "system", "content": instruction},
             {"role": "user", "content": prompt},
         ]
 
+    def generate(self, instruction, prompt, max_new_tokens=None):
+        messages = self._build_messages(instruction, prompt)
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        if self.prefix_cache is not None:
+            return self._generate_with_prefix_cache(messages, max_new_tokens)
         response = self.pipe(messages, max_new_tokens=max_new_tokens)
         return response[0]["generated_text"][-1]["content"]
+
+    def _generate_with_prefix_cache(self, messages, max_new_tokens):
+        tags = current_tags()
+        slot = (tags.get("case"), tags.get("agent"))
+        token_ids = self.tokenizer.apply_chat_template(
+            messages, tokenize=True, add_generation_prompt=True
+        )
+        past_key_values, _ = self.prefix_cache.take(slot, token_ids)
+        if past_key_values is None:
+            # 튜플 형식 대신 잘라낼 수 있는 Cache 객체를 돌려받도록 빈 캐시를 넘깁니다.
+            past_key_values = DynamicCache()
+
+        model = self.pipe.model
+        input_ids = torch.tensor([token_ids], device=model.device)
+        # generate는 캐시에 이미 있는 토큰을 건너뛰고 나머지만 prefill합니다.
+        with torch.no_grad():
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                past_key_values=past_key_values,
+                return_dict_in_generate=True,
+            )
+        self.prefix_cache.put(slot, token_ids, past_key_values)
+        generated = output.sequences[0, len(token_ids) :]
+        return self.tokenizer.decode(generated, skip_special_tokens=True).strip()
+
+    def generation_defaults(self):
+        defaults = {"max_new_tokens": self.max_new_tokens, "quantize": self.quantize}
+        # 샘플링 기본값은 모델의 generation_config에서 옵니다.
+        generation_config = getattr(self.pipe.model, "generation_config", None)
+        for name in ("do_sample", "temperature", "top_p", "top_k"):
+            defaults[name] = getattr(generation_config, name, None)
+        return defaults
+
+    def report(self):
+        """
+        접두사 KV 캐시의 적중률과 절약한 prefill 토큰 수를 반환합니다.
+        """
+        if self.prefix_cache is None:
+            return {"prefix_cache": None}
+        return {"prefix_cache": self.prefix_cache.report()}
+
+    def generate_batch(self, requests, max_new_tokens=None, batch_size=None):
+        """
+        여러 (지시문, 프롬프트) 쌍을 패딩하여 배치 단위로 생성합니다.
+        길이가 비슷한 프롬프트끼리 묶도록 길이순으로 정렬한 뒤 배치를 만들고, 결과는 입력 순서대로 반환합니다.
+        :param requests: (instruction, prompt) 튜플의 리스트
+        :param max_new_tokens: 생성할 최대 토큰 수(None이면 기본값)
+        :param batch_size: 한 번에 모델에 넣을 프롬프트 수(None이면 기본값)
+        :return: 각 요청의 응답 텍스트 리스트
+        """
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        batch_size = batch_size or self.batch_size
+        texts = [
+            self.tokenizer.apply_chat_template(
+                self._build_messages(instruction, prompt),
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+            for instruction, prompt in requests
+        ]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [None] * len(texts)
+
+        # 디코더 전용 모델은 생성이 프롬프트 끝에서 이어지도록 왼쪽에 패딩해야 합니다.
+        self.tokenizer.padding_side = "left"
+        model = self.pipe.model
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in indices], return_tensors="pt", padding=True
+            ).to(model.device)
+            with torch.no_grad():
+                output = model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                )
+            generated = output[:, inputs["input_ids"].shape[1] :]
+            decoded = self.tokenizer.batch_decode(generated, skip_special_tokens=True)
+            for i, text in zip(indices, decoded):
+                results[i] = text.strip()
+        return results
+
+    def stream_generate(self, instruction, prompt, max_new_tokens=None):
+        messages = self._build_messages(instruction, prompt)
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        errors = []
+
+        def run():
+            try:
+                self.pipe(
+                    messages,
+                    max_new_tokens=max_new_tokens or self.max_new_tokens,
+                    streamer=streamer,
+                )
+            except Exception as e:
+                # 생성이 실패해도 호출자의 반복이 끝나도록 종료 신호를 보내고, 예외는 호출자에게 넘깁니다.
+                errors.append(e)
+                streamer.end()
+
+        # 생성은 별도 스레드에서 진행하고, 디코딩된 조각을 도착하는 대로 내보냅니다.
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        for chunk in streamer:
+            if chunk:
+                yield chunk
+        worker.join()
+        if errors:
+            raise errors[0]
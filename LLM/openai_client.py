@@ -1,15 +1,16 @@
 # api_client/openai_client.py
-import requests
-import json
-from .base_client import BaseClient
+from .base_client import BaseClient, LLMRequestError
 
 
 class OpenAIClient(BaseClient):
-    def __init__(self, api_key, model):
+    platform = "openai"
+
+    def __init__(self, api_key, model, max_concurrency=8, **client_options):
+        super().__init__(max_concurrency=max_concurrency, **client_options)
         self.api_key = api_key
         self.model = model
 
-    def send_request(self, messages):
+    def build_request(self, messages):
         url = "https://api.openai.com/v1/chat/completions"
         headers = {
             "Content-Type": "application/json",
@@ -19,6 +20,16 @@ class OpenAIClient(BaseClient):
             "model": self.model,
             "messages": messages,
         }
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        text = json.loads(response.text)
-        return text.get("choices")[0].get("message").get("content")
+        return url, headers, payload
+
+    def parse_response(self, text):
+        choices = text.get("choices")
+        if not choices:
+            raise LLMRequestError(f"{self.platform} response has no choices: {text}")
+        return choices[0].get("message").get("content")
+
+    def parse_stream_event(self, event):
+        choices = event.get("choices")
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
@@ -0,0 +1,115 @@
+# LLM/prefix_cache.py
+import threading
+from collections import OrderedDict
+
+
+def cache_nbytes(past_key_values):
+    """
+    past_key_values가 차지하는 텐서 메모리(바이트)를 계산합니다.
+    """
+    if hasattr(past_key_values, "to_legacy_cache"):
+        past_key_values = past_key_values.to_legacy_cache()
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for layer in past_key_values
+        for tensor in layer[:2]
+    )
+
+
+def crop_cache(past_key_values, length):
+    """
+    past_key_values를 앞쪽 length개 토큰까지만 남긴 새 캐시로 만듭니다.
+    transformers 4.41의 DynamicCache에는 crop이 없으므로 키/값 텐서를 직접 자릅니다.
+    잘라낸 뒤에도 원래 텐서 전체가 메모리에 남지 않도록 복사본을 만듭니다.
+    """
+    cropped = tuple(
+        (key[..., :length, :].contiguous(), value[..., :length, :].contiguous())
+        for key, value in past_key_values.to_legacy_cache()
+    )
+    return type(past_key_values).from_legacy_cache(cropped)
+
+
+def common_prefix_length(a, b):
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+
+class PrefixCache:
+    """
+    슬롯(사례와 에이전트)마다 마지막 프롬프트의 토큰과 past_key_values를 보관하는 LRU 캐시입니다.
+    같은 사례 안에서 에이전트의 프롬프트는 지시문, 법정 규칙, 공판 기록처럼 앞부분이 같고 끝만 달라지므로
+    공통 접두사의 KV 캐시를 재사용하면 새로 붙은 부분만 prefill하면 됩니다.
+    전체 KV 캐시 크기가 max_bytes를 넘으면 가장 오래 사용되지 않은 슬롯부터 제거합니다.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+        self.calls = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.prefill_tokens_saved = 0
+        self.evictions = 0
+
+    def take(self, slot, token_ids):
+        """
+        슬롯의 캐시를 꺼내 token_ids와 겹치는 접두사 길이만큼 잘라 반환합니다.
+        생성이 끝나면 put으로 새 캐시를 되돌려 놓아야 합니다.
+        :return: (재사용할 past_key_values 또는 None, 재사용한 토큰 수)
+        """
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += len(token_ids)
+            entry = self._entries.pop(slot, None)
+            if entry is None:
+                return None, 0
+            cached_ids, past_key_values, nbytes = entry
+            self._total_bytes -= nbytes
+
+        # 모델이 다음 토큰을 예측하려면 마지막 토큰 하나는 다시 넣어야 합니다.
+        reused = min(common_prefix_length(cached_ids, token_ids), len(token_ids) - 1)
+        if reused <= 0:
+            return None, 0
+        past_key_values = crop_cache(past_key_values, reused)
+        with self._lock:
+            self.hits += 1
+            self.prefill_tokens_saved += reused
+        return past_key_values, reused
+
+    def put(self, slot, token_ids, past_key_values):
+        """
+        프롬프트 token_ids까지의 KV 캐시를 슬롯에 저장합니다. 생성된 토큰 부분은 잘라냅니다.
+        """
+        past_key_values = crop_cache(past_key_values, len(token_ids))
+        nbytes = cache_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(slot, None)
+            if previous is not None:
+                self._total_bytes -= previous[2]
+            self._entries[slot] = (list(token_ids), past_key_values, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def report(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.calls if self.calls else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "prefill_tokens_saved": self.prefill_tokens_saved,
+                "evictions": self.evictions,
+                "slots": len(self._entries),
+                "bytes": self._total_bytes,
+            }
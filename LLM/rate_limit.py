@@ -0,0 +1,176 @@
+# LLM/rate_limit.py
+import asyncio
+import random
+import re
+import threading
+import time
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class _Bucket:
+    """
+    분당 예산(capacity)을 초당 capacity/60씩 채우는 토큰 버킷입니다.
+    예약은 잔량을 음수로 만들 수 있으며, 그만큼 뒤의 요청이 더 오래 기다립니다.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def clamp(self, remaining, now):
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+
+class RateLimiter:
+    """
+    한 플랫폼의 모든 클라이언트와 작업 스레드가 공유하는 속도 제한기입니다.
+    분당 요청 수(RPM)와 분당 토큰 수(TPM) 예산을 지키고, 응답의 X-Ratelimit-* 헤더와
+    429 응답을 보고 모든 작업자가 함께 잠시 멈추도록 합니다.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute=None, tokens_per_minute=None):
+        with self._lock:
+            self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+            self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, tokens=0):
+        """
+        요청 하나와 tokens개의 토큰을 예약하고, 보내기 전에 기다려야 할 초 수를 반환합니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self._pause_until - now, 0.0)
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1, now))
+            if self._tokens is not None and tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+            return delay
+
+    def acquire(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """
+        응답의 실제 토큰 사용량으로 예약한 추정치를 보정합니다.
+        """
+        if self._tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens.adjust(actual_tokens - estimated_tokens, time.monotonic())
+
+    def pause(self, seconds):
+        """
+        이 플랫폼으로 가는 모든 요청을 seconds초 동안 멈춥니다.
+        """
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """
+        X-Ratelimit-Remaining-* 헤더로 버킷 잔량을 맞추고, 할당량이 소진되었으면 재설정 시각까지 멈춥니다.
+        """
+        if not headers:
+            return
+        now = time.monotonic()
+        for kind in ("requests", "tokens"):
+            remaining = _parse_number(headers.get(f"X-Ratelimit-Remaining-{kind.title()}"))
+            if remaining is None:
+                continue
+            with self._lock:
+                bucket = self._requests if kind == "requests" else self._tokens
+                if bucket is not None:
+                    bucket.clamp(remaining, now)
+            if remaining <= 0:
+                reset = parse_duration(headers.get(f"X-Ratelimit-Reset-{kind.title()}"))
+                self.pause(reset if reset is not None else 60.0)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(platform, requests_per_minute=None, tokens_per_minute=None):
+    """
+    플랫폼별로 하나의 RateLimiter를 반환합니다. 예산이 주어지면 기존 제한기의 설정을 갱신합니다.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(platform)
+        if limiter is None:
+            limiter = _limiters[platform] = RateLimiter(
+                requests_per_minute, tokens_per_minute
+            )
+        elif requests_per_minute or tokens_per_minute:
+            limiter.configure(requests_per_minute, tokens_per_minute)
+        return limiter
+
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=60.0):
+    """
+    재시도 대기 시간을 계산합니다. 서버가 Retry-After를 주면 그 값을, 아니면
+    상한이 있는 지수 백오프에 full jitter를 적용한 값을 사용합니다.
+    :param attempt: 0부터 시작하는 재시도 횟수
+    """
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+def parse_retry_after(headers):
+    if not headers:
+        return None
+    return parse_duration(headers.get("Retry-After"))
+
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value):
+    """
+    "20", "1.5s", "6m0s", "20ms" 같은 재설정 시간 표기를 초 단위로 바꿉니다.
+    """
+    if value is None:
+        return None
+    number = _parse_number(value)
+    if number is not None:
+        return number
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    parts = _DURATION_PATTERN.findall(str(value))
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
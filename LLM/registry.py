@@ -0,0 +1,30 @@
+# LLM/registry.py
+import importlib
+
+# llm_type별 백엔드 모듈과 클래스 이름. 모듈은 해당 백엔드를 처음 사용할 때 불러오므로
+# API 백엔드만 쓰는 실행은 torch와 transformers를 불러오지 않습니다.
+BACKENDS = {
+    "offline": ("LLM.offlinellm", "OfflineLLM"),
+    "apillm": ("LLM.apillm", "APILLM"),
+    "replay": ("LLM.replayllm", "ReplayLLM"),
+}
+
+
+def register_backend(llm_type, module_name, class_name):
+    """
+    새 llm_type을 등록합니다. 모듈은 load_backend가 호출될 때 불러옵니다.
+    """
+    BACKENDS[llm_type] = (module_name, class_name)
+
+
+def load_backend(llm_type):
+    """
+    llm_type에 해당하는 LLM 클래스를 불러옵니다.
+    :param llm_type: 등록된 백엔드 이름
+    :return: LLM 하위 클래스
+    """
+    try:
+        module_name, class_name = BACKENDS[llm_type]
+    except KeyError:
+        raise ValueError(f"Unsupported llm_type: {llm_type}") from None
+    return getattr(importlib.import_module(module_name), class_name)
@@ -0,0 +1,179 @@
+# LLM/replayllm.py
+import json
+import os
+import random
+import threading
+import time
+
+from .cache import make_cache_key
+from .llm import LLM
+
+REPLAY_MODES = ("record", "replay", "synthetic")
+
+
+class ReplayLLM(LLM):
+    """
+    실제 엔드포인트 없이 파이프라인을 실행하기 위한 기록/재생 백엔드입니다.
+    - record: 실제 LLM을 호출하고 (지시문, 프롬프트, 응답)을 JSONL 파일에 기록합니다.
+    - replay: 기록된 응답을 그대로 돌려줍니다. 기록에 없는 요청은 on_miss에 따라 처리합니다.
+    - synthetic: 프롬프트 종류를 보고 에이전트가 해석할 수 있는 형식의 가짜 응답을 만듭니다.
+    latency와 latency_jitter로 응답마다 가짜 지연 시간을 줄 수 있습니다.
+    """
+
+    platform = "replay"
+
+    def __init__(
+        self,
+        mode="synthetic",
+        path=None,
+        llm=None,
+        latency=0.0,
+        latency_jitter=0.0,
+        on_miss="synthetic",
+        seed=0,
+    ):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unsupported replay mode: {mode}")
+        if mode == "record" and llm is None:
+            raise ValueError("record mode needs a live llm to record from")
+        if mode in ("record", "replay") and not path:
+            raise ValueError(f"{mode} mode needs a recording path")
+        if on_miss not in ("synthetic", "error"):
+            raise ValueError(f"Unsupported on_miss policy: {on_miss}")
+
+        self.mode = mode
+        self.path = path
+        self.llm = llm
+        self.model = mode
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.on_miss = on_miss
+
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._recorded = {}
+        self.hits = 0
+        self.misses = 0
+
+        if mode == "replay":
+            self._recorded = self.load_recording(path)
+        elif mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @staticmethod
+    def load_recording(path):
+        """
+        기록 파일을 {키: 응답} 딕셔너리로 불러옵니다.
+        """
+        recorded = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    recorded[record["key"]] = record["response"]
+        return recorded
+
+    @staticmethod
+    def _key(instruction, prompt, args, kwargs):
+        # 기록은 플랫폼과 무관하게 재생할 수 있도록 플랫폼과 모델을 키에서 뺍니다.
+        return make_cache_key(None, None, instruction, prompt, args, kwargs)
+
+    def _sleep(self):
+        if not self.latency and not self.latency_jitter:
+            return
+        with self._lock:
+            delay = self._random.gauss(self.latency, self.latency_jitter)
+        time.sleep(max(delay, 0.0))
+
+    def generation_defaults(self):
+        # record 모드에서는 실제로 응답을 만드는 백엔드의 설정을 따릅니다.
+        return self.llm.generation_defaults() if self.llm is not None else {}
+
+    def generate(self, instruction, prompt, *args, **kwargs):
+        key = self._key(instruction, prompt, args, kwargs)
+
+        if self.mode == "record":
+            start = time.perf_counter()
+            response = self.llm.generate(instruction, prompt, *args, **kwargs)
+            self._record(key, instruction, prompt, response, time.perf_counter() - start)
+            return response
+
+        self._sleep()
+        if self.mode == "replay":
+            with self._lock:
+                response = self._recorded.get(key)
+                if response is not None:
+                    self.hits += 1
+                    return response
+                self.misses += 1
+            if self.on_miss == "error":
+                raise KeyError(f"No recorded response for request {key[:12]}")
+        return self.synthesize(instruction, prompt)
+
+    def stream_generate(self, instruction, prompt, *args, **kwargs):
+        if self.mode != "record":
+            # 재생과 합성 응답은 전체 텍스트를 한 조각으로 반환합니다.
+            yield self.generate(instruction, prompt, *args, **kwargs)
+            return
+        key = self._key(instruction, prompt, args, kwargs)
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.llm.stream_generate(instruction, prompt, *args, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        self._record(
+            key, instruction, prompt, "".join(chunks), time.perf_counter() - start
+        )
+
+    def _record(self, key, instruction, prompt, response, latency):
+        record = {
+            "key": key,
+            "instruction": instruction,
+            "prompt": prompt,
+            "response": response,
+            "latency": latency,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def synthesize(self, instruction, prompt):
+        """
+        Agent가 보내는 프롬프트 종류별로 형식에 맞는 가짜 응답을 만듭니다.
+        """
+        tag = make_cache_key(None, None, instruction, prompt)[:8]
+        if "experience, case, or legal database is needed" in prompt:
+            return json.dumps({"experience": True, "case": True, "legal": True})
+        if "formulate a query" in prompt:
+            return json.dumps({"query": f"합성 질의 {tag}"}, ensure_ascii=False)
+        if "Is additional legal reference needed" in prompt:
+            # 법률 검색 API를 호출하지 않도록 false를 반환합니다.
+            return "false"
+        if '"focus_points"' in prompt:
+            return json.dumps(
+                {
+                    "context": f"합성 사건 배경 {tag}",
+                    "content": f"합성 경험 설명 {tag}",
+                    "focus_points": "핵심 포인트1, 핵심 포인트2, 핵심 포인트3",
+                    "guidelines": "가이드라인1, 가이드라인2, 가이드라인3",
+                },
+                ensure_ascii=False,
+            )
+        if '"response_directions"' in prompt:
+            return json.dumps(
+                {
+                    "content": f"합성 사례 이름과 배경 {tag}",
+                    "case_type": "계약 분쟁",
+                    "keywords": "키워드1, 키워드2, 키워드3",
+                    "quick_reaction_points": "포인트1, 포인트2, 포인트3",
+                    "response_directions": "방향1, 방향2, 방향3",
+                },
+                ensure_ascii=False,
+            )
+        if '"agility"' in prompt:
+            return json.dumps({"agility": 3, "professionalism": 3, "logic": 3})
+        return f"합성 응답 {tag}: 본 측은 앞선 진술과 제출된 증거를 바탕으로 주장을 유지합니다."
+
+    def report(self):
+        with self._lock:
+            return {"mode": self.mode, "hits": self.hits, "misses": self.misses}
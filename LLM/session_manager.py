@@ -0,0 +1,163 @@
+# LLM/session_manager.py
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# (토큰, 유효 시간(초))을 반환하는 함수
+TokenFetcher = Callable[[], Tuple[str, float]]
+
+
+class SessionManager:
+    """
+    LLM/ 의 모든 클라이언트가 공유하는 자격 증명 및 HTTP 세션 관리자입니다.
+    - 플랫폼마다 keep-alive 연결 풀을 가진 세션을 하나씩 재사용합니다.
+    - 접근 토큰을 만료 시점까지 캐시하고, 만료 전에 백그라운드에서 미리 갱신합니다.
+    """
+
+    def __init__(self, refresh_margin=300):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._async_sessions = {}
+        self._tokens = {}
+        self._token_locks = {}
+        self._refresh_timers = {}
+
+    # --- Sessions --- #
+
+    def get_session(self, platform, pool_size=8) -> requests.Session:
+        """
+        플랫폼별 동기 세션을 반환합니다.
+        :param platform: 플랫폼 이름
+        :param pool_size: 연결 풀 크기
+        """
+        with self._lock:
+            session = self._sessions.get(platform)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[platform] = session
+            return session
+
+    def get_async_session(self, platform, pool_size=8):
+        """
+        현재 이벤트 루프에서 사용할 플랫폼별 aiohttp 세션을 반환합니다.
+        :param platform: 플랫폼 이름
+        :param pool_size: 연결 풀 크기
+        """
+        import aiohttp
+
+        key = (platform, asyncio.get_running_loop())
+        with self._lock:
+            session = self._async_sessions.get(key)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=30)
+                session = aiohttp.ClientSession(connector=connector)
+                self._async_sessions[key] = session
+            return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            for timer in self._refresh_timers.values():
+                timer.cancel()
+            self._refresh_timers.clear()
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key in self._async_sessions if key[1] is loop]
+            sessions = [self._async_sessions.pop(key) for key in keys]
+        for session in sessions:
+            await session.close()
+
+    # --- Tokens --- #
+
+    def _token_lock(self, key):
+        with self._lock:
+            return self._token_locks.setdefault(key, threading.Lock())
+
+    def _cached_token(self, key):
+        cached = self._tokens.get(key)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        return None
+
+    def _store_token(self, key, token, expires_in, fetcher):
+        self._tokens[key] = (token, time.time() + expires_in)
+        if fetcher is not None:
+            self._schedule_refresh(key, fetcher, expires_in)
+
+    def get_token(self, key, fetcher: TokenFetcher) -> str:
+        """
+        캐시된 토큰을 반환하고, 없거나 만료되었으면 새로 발급받습니다.
+        :param key: 자격 증명을 구분하는 키
+        :param fetcher: (토큰, 유효 시간)을 반환하는 함수
+        """
+        token = self._cached_token(key)
+        if token is not None:
+            return token
+        with self._token_lock(key):
+            token = self._cached_token(key)
+            if token is None:
+                token, expires_in = fetcher()
+                self._store_token(key, token, expires_in, fetcher)
+            return token
+
+    async def aget_token(self, key, afetcher, fetcher: TokenFetcher = None) -> str:
+        """
+        get_token의 비동기 버전입니다. 백그라운드 갱신에는 동기 fetcher를 사용합니다.
+        """
+        token = self._cached_token(key)
+        if token is not None:
+            return token
+        token, expires_in = await afetcher()
+        self._store_token(key, token, expires_in, fetcher)
+        return token
+
+    def invalidate_token(self, key):
+        """
+        서버가 토큰을 거부했을 때 캐시에서 제거하여 다음 호출에서 다시 발급받게 합니다.
+        """
+        self._tokens.pop(key, None)
+
+    def _schedule_refresh(self, key, fetcher, expires_in):
+        delay = max(expires_in - self.refresh_margin, 0)
+        if not delay:
+            return
+
+        def refresh():
+            try:
+                with self._token_lock(key):
+                    token, new_expires_in = fetcher()
+                    self._store_token(key, token, new_expires_in, fetcher)
+            except Exception as e:
+                # 갱신에 실패해도 기존 토큰은 만료될 때까지 그대로 사용합니다.
+                logger.warning(f"Background token refresh failed for {key[0]}: {e}")
+
+        timer = threading.Timer(delay, refresh)
+        timer.daemon = True
+        with self._lock:
+            previous = self._refresh_timers.pop(key, None)
+            if previous is not None:
+                previous.cancel()
+            self._refresh_timers[key] = timer
+        timer.start()
+
+
+_session_manager = SessionManager()
+
+
+def get_session_manager() -> SessionManager:
+    return _session_manager
@@ -0,0 +1,19 @@
+# LLM/tokens.py
+import re
+
+# 한글, 한자, 가나는 대체로 한 글자가 토큰 하나에 가깝습니다.
+_CJK_PATTERN = re.compile(r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-鿿가-힯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 텍스트의 토큰 수를 어림합니다.
+    CJK 문자는 글자당 1토큰, 그 밖의 공백이 아닌 문자는 4글자당 1토큰으로 셉니다.
+    :param text: 대상 텍스트
+    :return: 추정 토큰 수
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk - text.count(" ") - text.count("\n")
+    return cjk + max(other, 0) // 4 + 1
@@ -1,23 +1,54 @@
 # api_client/wenxin_client.py
-import requests
-import json
-from .base_client import BaseClient
-import time
+from .base_client import BaseClient, LLMRequestError
+
+# 110/111: 접근 토큰이 유효하지 않거나 만료됨
+AUTH_EXPIRED_CODES = (110, 111)
 
 
 class WenxinClient(BaseClient):
-    def __init__(self, api_key, api_secret, model):
+    platform = "wenxin"
+
+    def __init__(self, api_key, api_secret, model, max_concurrency=8, **client_options):
+        super().__init__(max_concurrency=max_concurrency, **client_options)
         self.api_key = api_key
         self.api_secret = api_secret
         self.model = model
 
-    def get_access_token(self):
-        url = f"https://aip.baidubce.com/oauth/2.0/token?grant_type=client_credentials&client_id={self.api_key}&client_secret={self.api_secret}"
+    def _token_url(self):
+        return f"https://aip.baidubce.com/oauth/2.0/token?grant_type=client_credentials&client_id={self.api_key}&client_secret={self.api_secret}"
+
+    def _token_key(self):
+        return (self.platform, self.api_key)
+
+    def _fetch_access_token(self):
         headers = {"Content-Type": "application/json", "Accept": "application/json"}
-        response = requests.post(url, headers=headers)
-        return response.json().get("access_token")
+        response = self.session.post(self._token_url(), headers=headers)
+        text = response.json()
+        return text.get("access_token"), text.get("expires_in", 0)
+
+    async def _afetch_access_token(self):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        session, _ = self._get_async_state()
+        async with session.post(self._token_url(), headers=headers) as response:
+            text = await response.json(content_type=None)
+        return text.get("access_token"), text.get("expires_in", 0)
+
+    def get_access_token(self):
+        # 토큰은 만료될 때까지 캐시되며, 만료 전에 백그라운드에서 갱신됩니다.
+        return self.session_manager.get_token(
+            self._token_key(), self._fetch_access_token
+        )
 
-    def send_request(
+    async def aget_access_token(self):
+        return await self.session_manager.aget_token(
+            self._token_key(), self._afetch_access_token, self._fetch_access_token
+        )
+
+    async def abuild_request(self, messages, *args, **kwargs):
+        access_token = await self.aget_access_token()
+        return self.build_request(messages, *args, access_token=access_token, **kwargs)
+
+    def build_request(
         self,
         messages,
         temperature=0.8,
@@ -34,11 +65,13 @@ class WenxinClient(BaseClient):
         response_format=None,
         user_id=None,
         tool_choice=None,
+        access_token=None,
         *args,
         **kwargs,
     ):
 
-        access_token = self.get_access_token()
+        if access_token is None:
+            access_token = self.get_access_token()
         if self.model == "ERNIE-4.0-8K":
             endpoint = "completions_pro"
         elif self.model == "ERNIE-Speed-128K":
@@ -84,42 +117,25 @@ class WenxinClient(BaseClient):
         if tool_choice:
             payload["tool_choice"] = tool_choice
 
-        response = requests.post(base_url, headers=headers, data=json.dumps(payload))
-
-        # 속도 제한 처리
-        if response.status_code == 429:
-            print("경고: 요청 속도가 제한을 초과했습니다!")
-            remaining_requests = int(
-                response.headers.get("X-Ratelimit-Remaining-Requests", 0)
-            )
-            remaining_tokens = int(
-                response.headers.get("X-Ratelimit-Remaining-Tokens", 0)
-            )
-            if remaining_requests == 0 or remaining_tokens == 0:
-                sleep_time = 60  # 60초 동안 대기한 뒤 재시도
-                print(f"할당량이 모두 소진되었습니다. {sleep_time}초 후에 다시 시도합니다...")
-                time.sleep(sleep_time)
-                return self.send_request(
-                    messages,
-                    temperature,
-                    top_p,
-                    penalty_score,
-                    stream,
-                    enable_system_memory,
-                    system_memory_id,
-                    stop,
-                    disable_search,
-                    enable_citation,
-                    enable_trace,
-                    max_output_tokens,
-                    response_format,
-                    user_id,
-                    tool_choice,
-                )
-
-        text = json.loads(response.text)
+        return base_url, headers, payload
+
+    def is_rate_limited_body(self, text):
+        # 18: QPS 한도 초과, 336501/336502: RPM/TPM 한도 초과
+        return text.get("error_code") in (18, 336501, 336502)
+
+    def is_auth_expired_body(self, text):
+        return text.get("error_code") in AUTH_EXPIRED_CODES
+
+    def invalidate_credentials(self):
+        self.session_manager.invalidate_token(self._token_key())
+
+    def parse_response(self, text):
         print(text)
 
+        # 새 토큰으로 다시 보낸 요청도 거부되면 빈 결과 대신 오류를 냅니다.
+        if self.is_auth_expired_body(text):
+            raise LLMRequestError(f"{self.platform} rejected the access token: {text}")
+
         if "result" not in text:
             print("경고: 응답에서 result 필드를 찾을 수 없습니다!")
             return ""
@@ -134,3 +150,6 @@ class WenxinClient(BaseClient):
             print(text["function_call"])
 
         return result
+
+    def parse_stream_event(self, event):
+        return event.get("result")
@@ -1,16 +1,19 @@
 # api_client/zhipuai_client.py
-import requests
-import json
-from .base_client import BaseClient
+from .base_client import BaseClient, LLMRequestError
 from typing import List, Dict, Optional, Union
 
 
 class ZhipuAIClient(BaseClient):
-    def __init__(self, api_key: str, model: str):
+    platform = "zhipuai"
+
+    def __init__(
+        self, api_key: str, model: str, max_concurrency: int = 8, **client_options
+    ):
+        super().__init__(max_concurrency=max_concurrency, **client_options)
         self.api_key = api_key
         self.model = model
 
-    def send_request(
+    def build_request(
         self,
         messages: List[Dict[str, str]],
         request_id: Optional[str] = None,
@@ -25,7 +28,7 @@ class ZhipuAIClient(BaseClient):
         user_id: Optional[str] = None,
         *args,
         **kwargs,
-    ) -> str:
+    ):
         url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -77,6 +80,16 @@ class ZhipuAIClient(BaseClient):
             user_id, str
         ), "user_id must be a string or None"
 
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        text = json.loads(response.text)
-        return text.get("choices")[0].get("message").get("content")
+        return url, headers, payload
+
+    def parse_response(self, text: Dict) -> str:
+        choices = text.get("choices")
+        if not choices:
+            raise LLMRequestError(f"{self.platform} response has no choices: {text}")
+        return choices[0].get("message").get("content")
+
+    def parse_stream_event(self, event):
+        choices = event.get("choices")
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
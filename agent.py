@@ -1,11 +1,28 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Iterator, Tuple
 import re
 import json
+from LLM.context import llm_tags
 from LLM.deli_client import search_law
+from fanout import fan_out
+from transcript import Transcript
+import functools
 import uuid
 import logging
 
 
+def llm_phase(method):
+    """
+    메서드 안에서 이루어지는 LLM 호출에 에이전트, 역할, 단계(메서드 이름) 태그를 붙입니다.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with llm_tags(agent=self.name, role=self.role, phase=method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class Agent:
     def __init__(
         self,
@@ -16,6 +33,8 @@ class Agent:
         llm: Any,
         db: Any,
         log_think=False,
+        executor: Any = None,
+        retrieval: Dict[str, Any] = None,
     ):
         self.id = id
         self.name = name
@@ -24,6 +43,10 @@ class Agent:
         self.llm = llm
         self.db = db
         self.log_think = log_think
+        # 서로 독립적인 LLM 호출을 동시에 실행할 executor(None이면 순차 실행)
+        self.executor = executor
+        # db.query_all에 넘길 검색 옵션(n_results, max_distance, dedupe_threshold, max_chars)
+        self.retrieval = retrieval or {"n_results": 3}
 
         self.logger = logging.getLogger(__name__)
 
@@ -45,6 +68,7 @@ class Agent:
 
         return {"plans": plans, "queries": queries}
 
+    @llm_phase
     def _get_plan(self, history_context: str) -> Dict[str, bool]:
         instruction = f"You are a {self.role}. {self.description}\n\n"
         prompt = "Based on the court history, analyze whether information from the experience, case, or legal database is needed. Return a JSON string with three key-value pairs for experience, case, and legal, with values being true or false."
@@ -56,15 +80,24 @@ class Agent:
     def _prepare_queries(
         self, plans: Dict[str, bool], history_context: str
     ) -> Dict[str, str]:
+        builders = {
+            "experience": self._prepare_experience_query,
+            "case": self._prepare_case_query,
+            "legal": self._prepare_legal_query,
+        }
+        names = [name for name in builders if plans[name]]
+        results = fan_out(
+            [(builders[name], (history_context,)) for name in names], self.executor
+        )
+
         queries = {}
-        if plans["experience"]:
-            queries["experience"] = self._prepare_experience_query(history_context)
-        if plans["case"]:
-            queries["case"] = self._prepare_case_query(history_context)
-        if plans["legal"]:
-            queries["legal"] = self._prepare_legal_query(history_context)
+        for name, result in zip(names, results):
+            # 실패한 질의는 건너뛰고 나머지 질의만 사용합니다.
+            if result.ok:
+                queries[name] = result.value
         return queries
 
+    @llm_phase
     def _prepare_experience_query(self, history_context: str) -> str:
         instruction = f"You are a {self.role}. {self.description}\n\n"
         prompt = """
@@ -79,8 +112,9 @@ class Agent:
         response = self.llm.generate(
             instruction=instruction, prompt=prompt + "\n\n" + history_context
         )
-        return self.extract_response(response)
+        return self._extract_query(response)
 
+    @llm_phase
     def _prepare_case_query(self, history_context: str) -> str:
         instruction = f"You are a {self.role}. {self.description}\n\n"
         prompt = """
@@ -95,8 +129,9 @@ class Agent:
         response = self.llm.generate(
             instruction=instruction, prompt=prompt + "\n\n" + history_context
         )
-        return self.extract_response(response)
+        return self._extract_query(response)
 
+    @llm_phase
     def _prepare_legal_query(self, history_context: str) -> str:
         instruction = f"You are a {self.role}. {self.description}\n\n"
         prompt = """
@@ -111,45 +146,62 @@ class Agent:
         response = self.llm.generate(
             instruction=instruction, prompt=prompt + "\n\n" + history_context
         )
-        return self.extract_response(response)
+        return self._extract_query(response)
 
     # --- Do Phase --- #
 
     def execute(
-        self, plan: Dict[str, Any], history_list: List[Dict[str, str]], prompt: str
+        self,
+        plan: Dict[str, Any],
+        history_list: List[Dict[str, str]],
+        prompt: str,
+        stream: bool = False,
     ) -> str:
         if not plan:
             context = self.prepare_history_context(history_list)
         else:
             context = self._prepare_context(plan, history_list)
+        if stream:
+            return self.speak_stream(context, prompt)
         return self.speak(context, prompt)
 
+    @llm_phase
     def speak(self, context: str, prompt: str) -> str:
         instruction = f"You are a {self.role}. {self.description}\n\n"
         full_prompt = f"{context}\n\n{prompt}"
         return self.llm.generate(instruction=instruction, prompt=full_prompt)
 
+    def speak_stream(self, context: str, prompt: str) -> Iterator[str]:
+        """
+        speak와 같은 발언을 생성하되, 생성되는 텍스트 조각을 도착하는 대로 반환합니다.
+        """
+        instruction = f"You are a {self.role}. {self.description}\n\n"
+        full_prompt = f"{context}\n\n{prompt}"
+        # 제너레이터는 소비될 때 실행되므로 llm_phase 대신 여기서 태그를 붙입니다.
+        with llm_tags(agent=self.name, role=self.role, phase="speak"):
+            yield from self.llm.stream_generate(
+                instruction=instruction, prompt=full_prompt
+            )
+
     def _prepare_context(
         self, plan: Dict[str, Any], history_list: List[Dict[str, str]]
     ) -> str:
         context = ""
-        queries = plan["queries"]
+        # 세 컬렉션의 질의를 한 번의 임베딩 배치로 처리하고 검색은 동시에 실행합니다.
+        memory = self.db.query_all(
+            plan["queries"], executor=self.executor, **self.retrieval
+        )
 
-        if "experience" in queries:
-            experience_context = self.db.query_experience_metadatas(
-                queries["experience"], n_results=3
-            )
+        if memory.experience is not None:
             context += (
-                f"\n다음 경험을 참고하여 응답의 논리적 엄밀성을 강화하십시오:\n{experience_context}\n"
+                f"\n다음 경험을 참고하여 응답의 논리적 엄밀성을 강화하십시오:\n{memory.experience}\n"
             )
 
-        if "case" in queries:
-            case_context = self.db.query_case_metadatas(queries["case"], n_results=3)
-            context += f"\nCase Context:\n{case_context}\n"
+        if memory.case is not None:
+            context += f"\nCase Context:\n{memory.case}\n"
 
-        if "legal" in queries:
-            legal_context = self.db.query_legal(queries["legal"], n_results=3)
-            context += f"\nLaw Context:\n{legal_context}\n"
+        if memory.legal is not None:
+            context += f"\nLaw Context:\n{memory.legal}\n"
 
         if self.log_think:
             self.logger.info(f"Agent ({self.role})\n\n{context}")
@@ -167,21 +219,22 @@ class Agent:
 
         case_content = self.prepare_case_content(history_context)
 
-        # Legal knowledge base reflection
-        legal_reflection = self._reflect_on_legal_knowledge(history_context)
-        if self.log_think:
-            self.logger.info(f"Agent ({self.role})\n\n{legal_reflection}")
-
-        # Experience reflection
-        experience_reflection = self._reflect_on_experience(
-            case_content, history_context
+        # 세 가지 반성은 서로 독립적이므로 동시에 실행합니다.
+        legal_result, experience_result, case_result = fan_out(
+            [
+                (self._reflect_on_legal_knowledge, (history_context,)),
+                (self._reflect_on_experience, (case_content, history_context)),
+                (self._reflect_on_case, (case_content, history_context)),
+            ],
+            self.executor,
         )
-        if self.log_think:
-            self.logger.info(f"Agent ({self.role})\n\n{experience_reflection}")
+        legal_reflection = self._reflection_or_error(legal_result)
+        experience_reflection = self._reflection_or_error(experience_result)
+        case_reflection = self._reflection_or_error(case_result)
 
-        # Case reflection
-        case_reflection = self._reflect_on_case(case_content, history_context)
         if self.log_think:
+            self.logger.info(f"Agent ({self.role})\n\n{legal_reflection}")
+            self.logger.info(f"Agent ({self.role})\n\n{experience_reflection}")
             self.logger.info(f"Agent ({self.role})\n\n{case_reflection}")
 
         return {
@@ -190,6 +243,11 @@ class Agent:
             "case_reflection": case_reflection,
         }
 
+    def _reflection_or_error(self, result) -> Dict[str, Any]:
+        if result.ok:
+            return result.value
+        return {"error": str(result.error)}
+
     def _reflect_on_legal_knowledge(self, history_context: str) -> Dict[str, Any]:
         # Determine if legal reference is needed
         need_legal = self._need_legal_reference(history_context)
@@ -211,6 +269,7 @@ class Agent:
         else:
             return {"needed_reference": False}
 
+    @llm_phase
     def _need_legal_reference(self, history_context: str) -> bool:
         instruction = (
             f"You are a {self.role}. {self.description}\n\n"
@@ -271,6 +330,7 @@ class Agent:
 
         return experience_entry
 
+    @llm_phase
     def _generate_experience_summary(
         self, case_content: str, history_context: str
     ) -> Dict[str, Any]:
@@ -333,6 +393,7 @@ class Agent:
 
         return case_entry
 
+    @llm_phase
     def _generate_case_summary(
         self, case_content: str, history_context: str
     ) -> Dict[str, Any]:
@@ -395,6 +456,13 @@ class Agent:
                 pass
         return response.strip()
 
+    def _extract_query(self, response: str) -> str:
+        # JSON으로 파싱되면 query 값만 꺼내 db 검색에 문자열이 전달되도록 합니다.
+        data = self.extract_response(response)
+        if isinstance(data, dict):
+            return str(data.get("query", json.dumps(data, ensure_ascii=False)))
+        return data
+
     def _extract_plans(self, plans_str: str) -> Dict[str, bool]:
         try:
             plans = plans_str if isinstance(plans_str, dict) else json.loads(plans_str)
@@ -418,15 +486,13 @@ class Agent:
         self.db.add_to_legal(id, document, metadata)
 
     def prepare_history_context(self, history_list: List[Dict[str, str]]) -> str:
-        formatted_history = []
-        for entry in history_list:
-            role = entry["role"]
-            name = entry["name"]
-            content = entry["content"].replace("\n", "\n  ")
-            formatted_entry = f"{role} ({name}):\n  {content}"
-            formatted_history.append(formatted_entry)
-        return "\n\n".join(formatted_history)
+        # Transcript는 서식 문자열을 증분으로 유지하므로 다시 포맷하지 않으며,
+        # 토큰 예산이 설정되어 있으면 오래된 발언을 요약으로 대체합니다.
+        if isinstance(history_list, Transcript):
+            return history_list.context()
+        return "\n\n".join(Transcript.format_entry(entry) for entry in history_list)
 
+    @llm_phase
     def prepare_case_content(self, history_context: str) -> str:
         instruction = f"당신은 전문적인 판사로서 사건 상황을 요약하는 데 능숙합니다.\n\n"
 
@@ -439,6 +505,7 @@ class Agent:
         return response
     
     # 선택 사항: 평점을 활용하여 반성 과정을 진행할 수 있습니다
+    @llm_phase
     def _evaluate_response(self, case_content: str, response: str) -> Dict[str, int]:
         instruction = ""
         prompt = f"""
@@ -0,0 +1,354 @@
+"""
+CourtSimulation 전체 공판을 스텁 LLM과 스텁 임베딩으로 실행하여 단계별 소요 시간을 측정합니다.
+
+사용 예:
+    python -m benchmarks.court_session --cases 20 --workers 4
+    python -m benchmarks.court_session --cases 20 --compare bench_results/baseline.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from rich.console import Console
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from EMDB.embedding import (  # noqa: E402
+    EmbeddingService,
+    embedding_service_reports,
+    register_embedding_service,
+)
+from main import CourtSimulation  # noqa: E402
+
+PHASES = [
+    "initialize_court",
+    "confirm_rights_and_obligations",
+    "initial_statements",
+    "judge_initial_question",
+    "debate_rounds",
+    "final_judgment",
+    "reflect_and_summary",
+]
+
+
+class HashEmbeddingFunction:
+    """
+    문장의 해시로 결정적인 단위 벡터를 만드는 스텁 임베딩 함수입니다.
+    """
+
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def __call__(self, input):
+        embeddings = []
+        for text in input:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            values = [
+                (digest[i % len(digest)] - 127.5) / 127.5 for i in range(self.dim)
+            ]
+            norm = sum(v * v for v in values) ** 0.5 or 1.0
+            embeddings.append([v / norm for v in values])
+        return embeddings
+
+
+class PhaseRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(list)
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.durations[phase].append(elapsed)
+
+
+class TimedCourtSimulation(CourtSimulation):
+    """
+    공판 단계별 소요 시간을 기록하는 CourtSimulation입니다.
+    fork_case로 복사된 사례 시뮬레이션도 같은 recorder를 공유합니다.
+    """
+
+    recorder = None
+    fixed_rounds = None
+
+    def initialize_court(self):
+        with self.recorder.measure("initialize_court"):
+            return super().initialize_court()
+
+    def confirm_rights_and_obligations(self):
+        with self.recorder.measure("confirm_rights_and_obligations"):
+            return super().confirm_rights_and_obligations()
+
+    def initial_statements(self, case):
+        with self.recorder.measure("initial_statements"):
+            return super().initial_statements(case)
+
+    def judge_initial_question(self):
+        with self.recorder.measure("judge_initial_question"):
+            return super().judge_initial_question()
+
+    def debate_rounds(self, rounds):
+        with self.recorder.measure("debate_rounds"):
+            return super().debate_rounds(self.fixed_rounds or rounds)
+
+    def final_judgment(self):
+        with self.recorder.measure("final_judgment"):
+            return super().final_judgment()
+
+    def reflect_and_summary(self):
+        with self.recorder.measure("reflect_and_summary"):
+            return super().reflect_and_summary()
+
+    def run_case(self, index, case):
+        with self.recorder.measure("case"):
+            return super().run_case(index, case)
+
+    def save_progress(self, index):
+        # 벤치마크는 진행 상황을 이어서 실행하지 않습니다.
+        pass
+
+    def load_progress(self):
+        return None
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "total": sum(values),
+    }
+
+
+def prefill_memory(simulation, size):
+    """
+    변호사 에이전트의 세 컬렉션에 size개씩 항목을 미리 채워 기억 크기에 따른 변화를 측정합니다.
+    """
+    for lawyer in simulation.lawyers:
+        for start in range(0, size, 256):
+            count = min(256, size - start)
+            ids = [str(uuid.uuid4()) for _ in range(count)]
+            documents = [f"{lawyer.name} 기억 {start + i}" for i in range(count)]
+            lawyer.db.experience_collection.add(
+                ids=ids,
+                documents=documents,
+                metadatas=[{"context": document} for document in documents],
+            )
+            lawyer.db.case_collection.add(
+                ids=ids,
+                documents=documents,
+                metadatas=[{"response_directions": document} for document in documents],
+            )
+            lawyer.db.legal_collection.add(ids=ids, documents=documents)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    config = CourtSimulation.load_json(os.path.abspath(args.config))
+    config["llm_type"] = "replay"
+    config["replay"] = {
+        "mode": "synthetic",
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "seed": args.seed,
+    }
+    config["seed"] = args.seed
+    config.pop("llm_cache", None)
+    config.pop("metrics", None)
+    config.pop("embedding_cache", None)
+    case_path = os.path.abspath(args.case)
+
+    register_embedding_service(
+        EmbeddingService("BAAI/bge-m3", device="cpu", encoder=HashEmbeddingFunction())
+    )
+    random.seed(args.seed)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="court_bench_") as workdir:
+        # db/, test_result/ 등 상대 경로 산출물은 임시 디렉터리에 만듭니다.
+        os.chdir(workdir)
+        try:
+            os.makedirs("test_result/ours/1", exist_ok=True)
+            config_path = os.path.join(workdir, "bench_config.json")
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False)
+
+            if args.tracemalloc:
+                tracemalloc.start()
+
+            recorder = PhaseRecorder()
+            TimedCourtSimulation.recorder = recorder
+            TimedCourtSimulation.fixed_rounds = args.rounds
+
+            init_start = time.perf_counter()
+            simulation = TimedCourtSimulation(
+                config_path,
+                case_path,
+                "WARNING",
+                workers=args.workers,
+                max_cases=args.cases,
+            )
+            simulation.console = Console(file=io.StringIO())
+            simulation.show_progress = False
+            init_time = time.perf_counter() - init_start
+
+            if args.memory_size:
+                prefill_memory(simulation, args.memory_size)
+
+            run_start = time.perf_counter()
+            simulation.run_simulation()
+            wall_time = time.perf_counter() - run_start
+
+            traced_peak = None
+            if args.tracemalloc:
+                traced_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+
+    cases_run = len(recorder.durations["case"])
+    return {
+        "meta": {
+            "benchmark": "court_session",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "summary": {
+            "cases": cases_run,
+            "init_seconds": init_time,
+            "wall_seconds": wall_time,
+            "throughput_cases_per_second": cases_run / wall_time if wall_time else 0.0,
+        },
+        "phases": {
+            phase: summarize(recorder.durations[phase]) for phase in PHASES + ["case"]
+        },
+        "memory": {
+            # Linux에서 ru_maxrss의 단위는 KB입니다.
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "tracemalloc_peak_bytes": traced_peak,
+        },
+        "embedding": embedding_service_reports(),
+    }
+
+
+def print_results(results, baseline=None):
+    console = Console()
+    summary = results["summary"]
+    console.print(
+        f"cases={summary['cases']} wall={summary['wall_seconds']:.2f}s "
+        f"throughput={summary['throughput_cases_per_second']:.3f} cases/s "
+        f"peak_rss={results['memory']['peak_rss_bytes'] / 2**20:.1f} MiB"
+    )
+    for phase, stats in results["phases"].items():
+        line = f"{phase:32s} p50={stats['p50'] * 1000:9.2f}ms p95={stats['p95'] * 1000:9.2f}ms"
+        if baseline and phase in baseline["phases"]:
+            base = baseline["phases"][phase]["p50"]
+            if base:
+                line += f"  p50 vs baseline {100 * (stats['p50'] - base) / base:+.1f}%"
+        console.print(line)
+    if baseline:
+        base = baseline["summary"]["throughput_cases_per_second"]
+        if base:
+            change = 100 * (summary["throughput_cases_per_second"] - base) / base
+            console.print(f"throughput vs baseline {change:+.1f}%")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark full court sessions.")
+    parser.add_argument("--config", default="role_config.json")
+    parser.add_argument("--case", default="data/validation.jsonl")
+    parser.add_argument("--cases", type=int, default=10, help="Number of cases to run")
+    parser.add_argument(
+        "--rounds", type=int, default=None, help="Fixed debate rounds per case"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--memory-size",
+        type=int,
+        default=0,
+        help="Entries to prefill into each lawyer collection",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Fake LLM latency in seconds"
+    )
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="Also trace Python heap peak"
+    )
+    parser.add_argument(
+        "--output", default=None, help="Where to write the JSON results"
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Previous results JSON to compare against"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.disable(logging.INFO)
+    results = run_benchmark(args)
+
+    output = args.output or os.path.join(
+        "bench_results", f"court_session_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+OfflineLLM의 CPU 추론 속도와 메모리를 fp32와 int8 동적 양자화 모드로 비교합니다.
+모드마다 별도 프로세스에서 모델을 불러오므로 최대 RSS가 서로 섞이지 않습니다.
+
+사용 예:
+    python -m benchmarks.offline_inference --model Qwen/Qwen2-1.5B --threads 8
+    python -m benchmarks.offline_inference --modes fp32 int8 --prompts 4 --max-new-tokens 64
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from rich.console import Console
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODES = {"fp32": None, "int8": "int8"}
+
+PROMPTS = [
+    "원고는 피고가 계약 대금을 지급하지 않았다고 주장합니다. 쟁점을 정리해 주십시오.",
+    "피고 변호사로서 원고의 손해배상 청구에 대한 반론을 간결하게 제시하십시오.",
+    "판사로서 양측 진술을 바탕으로 추가로 확인할 사실관계를 질문하십시오.",
+    "임대차 계약 해지와 보증금 반환에 관한 주요 법률 조항을 설명하십시오.",
+]
+
+
+def peak_rss_bytes():
+    # Linux에서 ru_maxrss의 단위는 KB입니다.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_mode(args):
+    """
+    현재 프로세스에서 한 가지 모드로 모델을 불러와 생성 속도를 측정합니다.
+    """
+    from LLM.offlinellm import OfflineLLM
+
+    load_start = time.perf_counter()
+    llm = OfflineLLM(
+        args.model,
+        device="cpu",
+        max_new_tokens=args.max_new_tokens,
+        quantize=MODES[args.mode],
+        num_threads=args.threads,
+    )
+    load_seconds = time.perf_counter() - load_start
+    rss_after_load = peak_rss_bytes()
+
+    prompts = [PROMPTS[i % len(PROMPTS)] for i in range(args.prompts)]
+    llm.generate(None, prompts[0], max_new_tokens=4)  # 워밍업
+
+    generated_tokens = 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        response = llm.generate(None, prompt)
+        generated_tokens += len(llm.tokenizer(response)["input_ids"])
+    seconds = time.perf_counter() - start
+
+    return {
+        "mode": args.mode,
+        "load_seconds": load_seconds,
+        "generate_seconds": seconds,
+        "generated_tokens": generated_tokens,
+        "tokens_per_second": generated_tokens / seconds if seconds else 0.0,
+        "rss_after_load_bytes": rss_after_load,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_in_subprocess(args, mode):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.offline_inference",
+        "--single",
+        mode,
+        "--model",
+        args.model,
+        "--prompts",
+        str(args.prompts),
+        "--max-new-tokens",
+        str(args.max_new_tokens),
+    ]
+    if args.threads:
+        command += ["--threads", str(args.threads)]
+    output = subprocess.check_output(command, cwd=REPO_ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_results(results):
+    console = Console()
+    baseline = results["modes"].get("fp32")
+    for mode, stats in results["modes"].items():
+        line = (
+            f"{mode:5s} load={stats['load_seconds']:7.1f}s "
+            f"tokens/s={stats['tokens_per_second']:7.2f} "
+            f"peak_rss={stats['peak_rss_bytes'] / 2**20:8.1f} MiB"
+        )
+        if baseline and mode != "fp32" and baseline["tokens_per_second"]:
+            speedup = stats["tokens_per_second"] / baseline["tokens_per_second"]
+            rss_ratio = stats["peak_rss_bytes"] / baseline["peak_rss_bytes"]
+            line += f"  speedup x{speedup:.2f} rss x{rss_ratio:.2f}"
+        console.print(line)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Compare fp32 and int8 CPU inference for OfflineLLM."
+    )
+    parser.add_argument("--model", default="Qwen/Qwen2-1.5B")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--prompts", type=int, default=4)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument(
+        "--threads", type=int, default=None, help="torch.set_num_threads value"
+    )
+    parser.add_argument(
+        "--output", default=None, help="Where to write the JSON results"
+    )
+    parser.add_argument("--single", choices=list(MODES), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.single:
+        args.mode = args.single
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = {
+        "meta": {
+            "benchmark": "offline_inference",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "modes": {mode: run_in_subprocess(args, mode) for mode in args.modes},
+    }
+
+    output = args.output or os.path.join(
+        "bench_results", f"offline_inference_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+EMDB 기억 저장소 백엔드(chroma, numpy)의 추가와 검색 처리량을 컬렉션 크기별로 비교합니다.
+임베딩 모델 없이 무작위 단위 벡터를 사용합니다.
+
+사용 예:
+    python -m benchmarks.vector_store
+    python -m benchmarks.vector_store --sizes 1000 10000 --dim 1024 --backends numpy
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+from rich.console import Console
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from EMDB.db import BACKENDS, COLLECTION_METADATA, open_client  # noqa: E402
+
+
+def random_unit_vectors(rng, count, dim):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_backend(backend, size, args, rng):
+    vectors = random_unit_vectors(rng, size, args.dim)
+    queries = random_unit_vectors(rng, args.queries, args.dim)
+
+    with tempfile.TemporaryDirectory(prefix=f"vector_bench_{backend}_") as workdir:
+        open_start = time.perf_counter()
+        client = open_client(workdir, backend)
+        collection = client.get_or_create_collection(
+            name="bench_experience", metadata=COLLECTION_METADATA
+        )
+        open_seconds = time.perf_counter() - open_start
+
+        add_start = time.perf_counter()
+        for start in range(0, size, args.batch_size):
+            end = min(start + args.batch_size, size)
+            collection.add(
+                ids=[str(i) for i in range(start, end)],
+                documents=[f"기억 {i}" for i in range(start, end)],
+                metadatas=[{"context": f"기억 {i}"} for i in range(start, end)],
+                embeddings=vectors[start:end].tolist(),
+            )
+        add_seconds = time.perf_counter() - add_start
+
+        query_start = time.perf_counter()
+        for query in queries:
+            collection.query(
+                query_embeddings=[query.tolist()],
+                n_results=args.top_k,
+                include=["documents", "metadatas", "distances"],
+            )
+        query_seconds = time.perf_counter() - query_start
+
+    return {
+        "open_seconds": open_seconds,
+        "add_seconds": add_seconds,
+        "adds_per_second": size / add_seconds if add_seconds else 0.0,
+        "query_seconds": query_seconds,
+        "queries_per_second": args.queries / query_seconds if query_seconds else 0.0,
+    }
+
+
+def print_results(results):
+    console = Console()
+    for size, backends in results["sizes"].items():
+        for backend, stats in backends.items():
+            console.print(
+                f"{size:>7} {backend:6s} "
+                f"open={stats['open_seconds'] * 1000:8.1f}ms "
+                f"add={stats['adds_per_second']:10.0f}/s "
+                f"query={stats['queries_per_second']:8.1f}/s"
+            )
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Compare memory store backends for add and query throughput."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS)
+    )
+    parser.add_argument("--dim", type=int, default=1024, help="bge-m3 uses 1024")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="Where to write the JSON results"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    rng = np.random.default_rng(args.seed)
+    results = {
+        "meta": {
+            "benchmark": "vector_store",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "sizes": {
+            size: {
+                backend: run_backend(backend, size, args, rng)
+                for backend in args.backends
+            }
+            for size in args.sizes
+        },
+    }
+
+    output = args.output or os.path.join(
+        "bench_results", f"vector_store_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
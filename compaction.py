@@ -0,0 +1,114 @@
+import logging
+import threading
+
+from LLM.context import llm_tags
+from LLM.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor:
+    """
+    사례 하나의 대화 기록을 호출당 토큰 예산 안으로 줄입니다.
+    예산을 넘으면 오래된 발언부터 누적 요약(rolling summary)에 접어 넣고 최근 발언은 그대로 유지합니다.
+    요약은 매번 새로 만들지 않고, 새로 밀려난 발언만 기존 요약에 덧붙여 갱신합니다.
+    """
+
+    def __init__(self, llm, token_budget, keep_recent=4, target_ratio=0.7):
+        """
+        :param llm: 요약에 사용할 LLM
+        :param token_budget: 호출당 대화 기록 토큰 예산
+        :param keep_recent: 항상 원문으로 유지할 최근 발언 수
+        :param target_ratio: 요약을 갱신할 때 목표로 하는 예산 대비 사용률. 한 번 갱신한 뒤 몇 턴은 추가 요약 없이 예산 안에 들도록 여유를 둡니다.
+        """
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.target_ratio = target_ratio
+
+        self._lock = threading.Lock()
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarized_upto = 0  # 요약에 포함된 발언 수
+        self._entry_tokens = []
+
+        self.renders = 0
+        self.summary_calls = 0
+        self.tokens_saved = 0
+
+    def render(self, transcript) -> str:
+        """
+        예산에 맞춘 대화 기록 문자열을 반환합니다.
+        :param transcript: Transcript 인스턴스
+        :return: 요약과 최근 발언으로 구성된 문자열
+        """
+        with self._lock:
+            total = len(transcript)
+            for index in range(len(self._entry_tokens), total):
+                self._entry_tokens.append(estimate_tokens(transcript.text(index, index + 1)))
+            full_tokens = sum(self._entry_tokens)
+
+            if self.summary_tokens + self._tail_tokens(self.summarized_upto) > self.token_budget:
+                self._advance(transcript)
+
+            self.renders += 1
+            if not self.summarized_upto:
+                return transcript.text()
+
+            compacted_tokens = self.summary_tokens + self._tail_tokens(self.summarized_upto)
+            self.tokens_saved += max(full_tokens - compacted_tokens, 0)
+            summary_block = (
+                f"공판 기록 요약 (앞선 발언 {self.summarized_upto}개):\n  "
+                + self.summary.replace("\n", "\n  ")
+            )
+            recent = transcript.text(self.summarized_upto)
+            return summary_block + ("\n\n" + recent if recent else "")
+
+    def _tail_tokens(self, start):
+        return sum(self._entry_tokens[start:])
+
+    def _advance(self, transcript):
+        # 최근 발언을 남기고, 목표 사용률 아래로 내려갈 때까지 요약 경계를 앞으로 옮깁니다.
+        limit = max(len(self._entry_tokens) - self.keep_recent, self.summarized_upto)
+        target = self.token_budget * self.target_ratio
+        boundary = self.summarized_upto
+        while boundary < limit and self.summary_tokens + self._tail_tokens(boundary) > target:
+            boundary += 1
+        if boundary == self.summarized_upto:
+            return
+
+        new_turns = transcript.text(self.summarized_upto, boundary)
+        try:
+            summary = self._summarize(new_turns)
+        except Exception as e:
+            # 요약에 실패하면 이번 호출은 원문을 그대로 사용합니다.
+            logger.warning(f"History summary update failed: {e}")
+            return
+        self.summary = summary
+        self.summary_tokens = estimate_tokens(summary)
+        self.summarized_upto = boundary
+        self.summary_calls += 1
+
+    def _summarize(self, new_turns):
+        instruction = "당신은 법원 서기로서 공판 기록을 정확하고 간결하게 요약하는 데 능숙합니다.\n\n"
+        prompt = (
+            "아래의 기존 요약에 새로 추가된 발언을 반영하여 갱신된 요약을 작성하십시오. "
+            "법정 규칙이나 절차적 확인처럼 정형화된 내용은 한 줄로 줄이고, "
+            "각 측의 청구, 주장, 증거, 재판장의 쟁점 정리는 빠짐없이 유지하십시오. 요약문만 출력하십시오.\n\n"
+            f"기존 요약:\n{self.summary or '(없음)'}\n\n"
+            f"새로 추가된 발언:\n{new_turns}"
+        )
+        with llm_tags(phase="history_summary"):
+            return self.llm.generate(instruction=instruction, prompt=prompt).strip()
+
+    def report(self):
+        """
+        사례별 압축 통계를 반환합니다.
+        """
+        with self._lock:
+            return {
+                "renders": self.renders,
+                "summary_calls": self.summary_calls,
+                "summarized_turns": self.summarized_upto,
+                "tokens_saved": self.tokens_saved,
+            }
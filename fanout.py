@@ -0,0 +1,51 @@
+import contextvars
+import logging
+from concurrent.futures import Executor
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallResult(NamedTuple):
+    value: Any
+    error: Optional[BaseException]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def fan_out(
+    calls: Sequence[Tuple[Callable[..., Any], tuple]],
+    executor: Optional[Executor] = None,
+) -> List[CallResult]:
+    """
+    서로 독립적인 호출들을 executor에서 동시에 실행하고, 입력 순서대로 결과를 돌려줍니다.
+    한 호출이 실패해도 다른 호출에는 영향을 주지 않으며, 실패는 CallResult.error에 담깁니다.
+    :param calls: (함수, 인자 튜플) 목록
+    :param executor: concurrent.futures.Executor. None이거나 호출이 하나뿐이면 현재 스레드에서 순서대로 실행합니다.
+    :return: 호출 순서와 같은 CallResult 목록
+    """
+    if executor is None or len(calls) <= 1:
+        results = []
+        for fn, args in calls:
+            try:
+                results.append(CallResult(fn(*args), None))
+            except Exception as e:
+                logger.exception(f"Call {getattr(fn, '__name__', fn)} failed")
+                results.append(CallResult(None, e))
+        return results
+
+    # 호출 측의 contextvars(로그 태그 등)가 작업 스레드에도 전달되도록 합니다.
+    futures = [
+        executor.submit(contextvars.copy_context().run, fn, *args)
+        for fn, args in calls
+    ]
+    results = []
+    for (fn, _), future in zip(calls, futures):
+        try:
+            results.append(CallResult(future.result(), None))
+        except Exception as e:
+            logger.exception(f"Call {getattr(fn, '__name__', fn)} failed")
+            results.append(CallResult(None, e))
+    return results
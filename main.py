@@ -1,47 +1,122 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import copy
+import io
 import json
 import os
 import random
 import logging
 import argparse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.console import Console
 from rich.logging import RichHandler
+from rich.live import Live
 from rich.panel import Panel
+from rich.table import Table
 from tqdm import trange
 
+from EMDB.consolidation import MemoryConsolidator
 from EMDB.db import db
-from LLM.offlinellm import OfflineLLM
-from LLM.apillm import APILLM
+from EMDB.embedding import embedding_service_reports, set_embedding_cache
+from EMDB.embedding_cache import EmbeddingCache
+from LLM.cache import CACHE_MODES, CachedLLM
+from LLM.context import llm_tags
+from LLM.metrics import InstrumentedLLM, MetricsRecorder
+from LLM.registry import load_backend
 from agent import Agent
+from compaction import HistoryCompactor
+from transcript import Transcript
+
+# main 모듈이 의존하는 모듈들을 불러오는 데 걸린 시간(--profile-startup 보고용)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 console = Console()
 
 
 class CourtSimulation:
-    def __init__(self, config_path, case_data, log_level, log_think=False):
+    def __init__(
+        self,
+        config_path,
+        case_data,
+        log_level,
+        log_think=False,
+        workers=1,
+        max_cases=62,
+        llm_cache_mode=None,
+        stream=None,
+        seed=None,
+    ):
         """
         법정 시뮬레이션 클래스를 초기화합니다.
         :param config_path: 구성 파일 경로
         :param case_data: 사례 데이터(단일 파일 경로 또는 여러 사례를 포함하는 디렉터리 경로)
         :param log_level: 로그 수준
+        :param workers: 동시에 진행할 사례 수
+        :param max_cases: 실행할 최대 사례 수(None이면 전체)
+        :param llm_cache_mode: 구성 파일의 LLM 응답 캐시 모드를 덮어쓸 값
+        :param stream: 발언을 생성되는 대로 화면에 표시할지 여부(None이면 구성 파일 값)
+        :param seed: 사례별 무작위 선택(변론 횟수)의 시드(None이면 구성 파일 값)
         """
         self.setup_logging(log_level)
-        self.config = self.load_json(config_path)
-        self.case_data = self.load_case_data(case_data)
-        if self.config["llm_type"] == "offline":
-            self.llm = OfflineLLM(self.config["model_path"])
-        elif self.config["llm_type"] == "apillm":
-            self.llm = APILLM(
-                api_key=self.config["api_key"],
-                api_secret=self.config.get("api_secret", None),
-                platform=self.config["model_platform"],
-                model=self.config["model_type"],
+        self.workers = workers
+        self.max_cases = max_cases
+        self.console = console
+        self.show_progress = True
+        # 구성 요소별 시작 시간(초). --profile-startup으로 확인할 수 있습니다.
+        self.startup_timings = {"import main modules": IMPORT_SECONDS}
+        with self.profile_startup("load config"):
+            self.config = self.load_json(config_path)
+        with self.profile_startup("load case data"):
+            self.case_data = self.load_case_data(case_data)
+        self.stream = self.config.get("stream", False) if stream is None else stream
+        self.seed = self.config.get("seed") if seed is None else seed
+        if self.seed is None and self.config["llm_type"] == "replay":
+            # 기록한 실행과 재생하는 실행의 프롬프트가 같도록 replay에서는 항상 시드를 고정합니다.
+            self.seed = self.config.get("replay", {}).get("seed", 0)
+        if self.seed is not None:
+            random.seed(self.seed)
+        self.llm = self.create_llm(llm_cache_mode)
+
+        # 에이전트 내부의 독립적인 LLM 호출(질의 생성, 반성)을 동시에 실행할 스레드 풀
+        fanout_workers = self.config.get("fanout_workers", 3)
+        self.executor = (
+            ThreadPoolExecutor(
+                max_workers=fanout_workers * workers, thread_name_prefix="fanout"
+            )
+            if fanout_workers > 1
+            else None
+        )
+
+        cache_config = self.config.get("embedding_cache")
+        if cache_config:
+            set_embedding_cache(
+                EmbeddingCache(
+                    path=cache_config.get("path", "cache/embeddings.sqlite3"),
+                    memory_entries=cache_config.get("memory_entries", 10000),
+                )
             )
 
-        self.judge = self.create_agent(self.config["judge"], log_think=log_think)
-        self.lawyers = [
-            self.create_agent(lawyer, log_think=log_think)
-            for lawyer in self.config["lawyers"]
-        ]
+        # 정리는 기억 항목을 합치고 지우므로 명시적으로 켠 경우에만 실행합니다.
+        consolidation_config = dict(self.config.get("memory_consolidation") or {})
+        enabled = consolidation_config.pop("enabled", bool(consolidation_config))
+        self.consolidate_every = consolidation_config.pop("every_cases", None)
+        if not enabled:
+            self.consolidate_every = None
+        self.consolidator = (
+            MemoryConsolidator(**consolidation_config)
+            if self.consolidate_every
+            else None
+        )
+
+        with self.profile_startup("create agents"):
+            self.judge = self.create_agent(self.config["judge"], log_think=log_think)
+            self.lawyers = [
+                self.create_agent(lawyer, log_think=log_think)
+                for lawyer in self.config["lawyers"]
+            ]
         self.role_colors = {
             "법원 서기": "cyan",
             "재판장": "yellow",
@@ -49,6 +124,31 @@ class CourtSimulation:
             "피고 변호사": "red",
         }
 
+    @contextmanager
+    def profile_startup(self, component):
+        """
+        블록의 실행 시간을 component의 시작 시간으로 기록합니다.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[component] = (
+                self.startup_timings.get(component, 0.0) + time.perf_counter() - start
+            )
+
+    def print_startup_profile(self):
+        """
+        구성 요소별 import 및 초기화 시간을 표로 출력합니다.
+        """
+        table = Table(title="Startup profile")
+        table.add_column("component")
+        table.add_column("seconds", justify="right")
+        for component, seconds in self.startup_timings.items():
+            table.add_row(component, f"{seconds:.3f}")
+        table.add_row("total", f"{sum(self.startup_timings.values()):.3f}")
+        self.console.print(table)
+
     @staticmethod
     def setup_logging(log_level):
         """
@@ -86,6 +186,76 @@ class CourtSimulation:
                 cases.append(case)
         return cases
 
+    def create_llm(self, llm_cache_mode=None):
+        """
+        구성에 따라 LLM을 생성하고, llm_cache.enabled가 참이거나 캐시 모드를 지정하면 디스크 캐시로 감쌉니다.
+        :param llm_cache_mode: 캐시 모드(readwrite, readonly, refresh). 지정하면 구성과 관계없이 캐시를 켭니다.
+        :return: LLM 인스턴스
+        """
+        llm = self.create_backend(self.config["llm_type"])
+
+        # 지표는 캐시 안쪽에서 기록하여 실제 백엔드 호출만 집계합니다.
+        metrics_config = self.config.get("metrics")
+        self.metrics = None
+        if metrics_config:
+            self.metrics = MetricsRecorder(
+                jsonl_path=metrics_config.get("jsonl_path"),
+                prometheus_path=metrics_config.get("prometheus_path"),
+            )
+            llm = InstrumentedLLM(llm, self.metrics)
+
+        # 캐시는 샘플링된 응답을 실행 간에 고정하므로 명시적으로 켠 경우에만 사용합니다.
+        cache_config = self.config.get("llm_cache") or {}
+        if cache_config.get("enabled", bool(cache_config)) or llm_cache_mode:
+            llm = CachedLLM(
+                llm,
+                path=cache_config.get("path", "cache/llm_cache.sqlite3"),
+                mode=llm_cache_mode or cache_config.get("mode", "readwrite"),
+                max_bytes=cache_config.get("max_bytes", 1 << 30),
+            )
+        return llm
+
+    def create_backend(self, llm_type):
+        """
+        llm_type에 해당하는 LLM 백엔드를 생성합니다.
+        :param llm_type: offline, apillm, replay 또는 register_backend로 등록한 이름
+        :return: LLM 인스턴스
+        """
+        with self.profile_startup(f"import {llm_type} backend"):
+            backend = load_backend(llm_type)
+        with self.profile_startup(f"init {llm_type} backend"):
+            if llm_type == "offline":
+                return backend(
+                    self.config["model_path"], **self.config.get("offline", {})
+                )
+            elif llm_type == "apillm":
+                return backend(
+                    api_key=self.config["api_key"],
+                    api_secret=self.config.get("api_secret", None),
+                    platform=self.config["model_platform"],
+                    model=self.config["model_type"],
+                    max_concurrency=self.config.get("max_concurrency", 8),
+                    **self.config.get("rate_limit", {}),
+                )
+            elif llm_type == "replay":
+                # record 모드에서는 replay.backend로 지정한 실제 백엔드의 응답을 기록합니다.
+                replay_config = self.config.get("replay", {})
+                mode = replay_config.get("mode", "synthetic")
+                return backend(
+                    mode=mode,
+                    path=replay_config.get("path"),
+                    llm=(
+                        self.create_backend(replay_config.get("backend", "apillm"))
+                        if mode == "record"
+                        else None
+                    ),
+                    latency=replay_config.get("latency", 0.0),
+                    latency_jitter=replay_config.get("latency_jitter", 0.0),
+                    on_miss=replay_config.get("on_miss", "synthetic"),
+                    seed=replay_config.get("seed", 0),
+                )
+            return backend(**self.config.get(llm_type, {}))
+
     def create_agent(self, role_config, log_think=False):
         """
         역할 에이전트를 생성합니다.
@@ -98,8 +268,39 @@ class CourtSimulation:
             role=role_config.get("role", None),
             description=role_config["description"],
             llm=self.llm,
-            db=db(role_config["name"]),
+            db=self.create_db(role_config["name"]),
             log_think=log_think,
+            executor=self.executor,
+            retrieval=self.config.get("retrieval"),
+        )
+
+    def create_db(self, agent_name):
+        """
+        에이전트의 기억 저장소를 생성합니다.
+        :param agent_name: 에이전트 이름
+        :return: db 인스턴스
+        """
+        store_config = self.config.get("memory_store", {})
+        return db(
+            agent_name,
+            store=store_config.get("mode", "per_agent"),
+            store_path=store_config.get("path", "db/shared"),
+            backend=store_config.get("backend", "chroma"),
+            **self.config.get("memory_write_buffer", {}),
+        )
+
+    def create_compactor(self):
+        """
+        history_token_budget가 설정되어 있으면 사례별 대화 기록 압축기를 만듭니다.
+        :return: HistoryCompactor 인스턴스 또는 None
+        """
+        token_budget = self.config.get("history_token_budget")
+        if not token_budget:
+            return None
+        return HistoryCompactor(
+            self.llm,
+            token_budget,
+            keep_recent=self.config.get("history_keep_recent", 4),
         )
 
     def add_to_history(self, role, name, content):
@@ -107,19 +308,39 @@ class CourtSimulation:
         대화를 기록에 추가합니다.
         :param role: 발언 역할
         :param name: 발언자 이름
-        :param content: 대화 내용
+        :param content: 대화 내용. 텍스트 조각의 이터레이터이면 패널을 실시간으로 갱신하며 표시하고,
+            스트림이 끝난 뒤 전체 텍스트를 기록에 추가합니다.
         """
+        if not isinstance(content, str):
+            content = self.render_stream(role, name, content)
+        else:
+            self.console.print(self.speech_panel(role, name, content))
         self.global_history.append({"role": role, "name": name, "content": content})
+
+    def speech_panel(self, role, name, content):
         color = self.role_colors.get(role, "white")
-        console.print(
-            Panel(content, title=f"{role} ({name})", border_style=color, expand=False)
-        )
+        return Panel(content, title=f"{role} ({name})", border_style=color, expand=False)
+
+    def render_stream(self, role, name, chunks):
+        """
+        스트리밍 발언을 패널에 실시간으로 표시하고 전체 텍스트를 반환합니다.
+        """
+        text = ""
+        with Live(
+            self.speech_panel(role, name, text),
+            console=self.console,
+            refresh_per_second=8,
+        ) as live:
+            for chunk in chunks:
+                text += chunk
+                live.update(self.speech_panel(role, name, text))
+        return text
 
     def initialize_court(self):
         """
         법정을 초기화합니다.
         """
-        self.global_history = []
+        self.global_history = Transcript(compactor=self.create_compactor())
         court_rules = self.config["stenographer"]["court_rules"]
         self.add_to_history("법원 서기", self.config["stenographer"]["name"], court_rules)
         self.add_to_history(
@@ -208,6 +429,7 @@ class CourtSimulation:
             None,
             history_list=self.global_history,
             prompt="원고 변호사와 피고 변호사의 진술을 바탕으로 양측 변호사가 어떤 쟁점을 중심으로 변론해야 하는지 요약하십시오. 현실에 부합하는 범위에서 최대한 간결하고 효과적으로 정리해 주십시오.",
+            stream=self.stream,
         )
         self.add_to_history("재판장", self.judge.name, content)
 
@@ -216,7 +438,7 @@ class CourtSimulation:
         변론 단계
         :param rounds: 변론 라운드 수
         """
-        for i in trange(rounds, desc="Debate Rounds"):
+        for i in trange(rounds, desc="Debate Rounds", disable=not self.show_progress):
             logging.info(f"Starting debate round {i+1}")
             for role, agent in [
                 ("원고 변호사", self.plaintiff),
@@ -227,6 +449,7 @@ class CourtSimulation:
                     p_q,
                     self.global_history,
                     prompt=f"경험, 법조문, 판례 및 법정 대화 기록을 바탕으로 변론을 시작하십시오. context에 포함된 법조문을 인용했다면 해당 부분을 명시해 주십시오. 주의: 1. 지금은 법정 변론 단계이며 법정 조사 단계가 아닙니다. 2. 당신은 {role}입니다.",
+                    stream=self.stream,
                 )
                 self.add_to_history(role, agent.name, content)
 
@@ -234,8 +457,10 @@ class CourtSimulation:
         """
         최종 판결
         """
-        content = self.judge.speak(
-            self.global_history, prompt="판사님, 판결을 내려 주십시오. (판결은 현실에 부합해야 합니다.)"
+        speak = self.judge.speak_stream if self.stream else self.judge.speak
+        content = speak(
+            self.judge.prepare_history_context(self.global_history),
+            prompt="판사님, 판결을 내려 주십시오. (판결은 현실에 부합해야 합니다.)",
         )
         self.add_to_history("재판장", self.judge.name, content)
 
@@ -276,6 +501,80 @@ class CourtSimulation:
                 return json.load(f)
         return None
 
+    def fork_case(self):
+        """
+        사례 하나를 독립적으로 진행할 수 있는 시뮬레이션 사본을 만듭니다.
+        LLM과 에이전트의 db는 공유하지만 기록, 역할 배정, 콘솔 출력은 사례마다 분리됩니다.
+        :return: (사례 시뮬레이션, 콘솔 출력 버퍼)
+        """
+        session = copy.copy(self)
+        session.judge = copy.copy(self.judge)
+        session.lawyers = [copy.copy(lawyer) for lawyer in self.lawyers]
+        buffer = io.StringIO()
+        session.console = Console(
+            file=buffer,
+            force_terminal=self.console.is_terminal,
+            color_system=self.console.color_system,
+            width=self.console.width,
+        )
+        session.show_progress = False
+        return session, buffer
+
+    def run_case(self, index, case):
+        """
+        사례 하나의 공판을 처음부터 끝까지 진행합니다.
+        :param index: 사례 인덱스
+        :param case: 사례 데이터
+        """
+        with llm_tags(case=index + 1):
+            self._run_case(index, case)
+        if self.metrics is not None:
+            # 지표 파일을 쓰지 못해도 끝난 사례를 실패로 처리하지 않습니다.
+            try:
+                self.metrics.write_prometheus()
+            except OSError:
+                logging.exception(
+                    f"Failed to write Prometheus metrics after case {index + 1}"
+                )
+
+    def _run_case(self, index, case):
+        self.console.print(f"\n사례 {index + 1} 시뮬레이션을 시작합니다", style="bold")
+        self.console.print("재판장을 제외한 다른 인원이 입장합니다", style="bold")
+        self.assign_roles()  # 역할을 무작위로 배정합니다.
+        self.initialize_court()
+        self.confirm_rights_and_obligations()
+        self.initial_statements(case)
+        self.judge_initial_question()
+
+        rounds = self.case_random(index).randint(3, 5)
+        self.debate_rounds(rounds)
+        if self.workers == 1:
+            self.save_progress(index)  # 현재 진행 상황을 기록합니다
+
+        self.final_judgment()
+        self.reflect_and_summary()
+        # 반성 단계에서 버퍼에 쌓인 기억을 사례가 끝날 때 한 번에 기록합니다.
+        for agent in [self.judge] + self.lawyers:
+            agent.db.flush()
+        self.console.print(f"사례 {index + 1} 공판이 종료되었습니다", style="bold")
+        if self.global_history.compactor is not None:
+            logging.info(
+                f"Case {index + 1} history compaction: {self.global_history.compactor.report()}"
+            )
+        self.save_court_log(
+            f"test_result/ours/1/court_session_test_case_{index + 1}.json"
+        )
+
+    def case_random(self, index):
+        """
+        사례별 난수 생성기를 반환합니다. 시드가 있으면 사례 인덱스로 파생한 생성기를 써서
+        --workers로 여러 사례를 동시에 진행해도 사례마다 같은 값이 나옵니다.
+        :param index: 사례 인덱스
+        """
+        if self.seed is None:
+            return random
+        return random.Random(f"{self.seed}:{index}")
+
     def run_simulation(self):
         """
         전체 법정 시뮬레이션 과정을 실행합니다.
@@ -283,27 +582,92 @@ class CourtSimulation:
         progress = self.load_progress()
         start_index = progress["current_case_index"] if progress else 0
 
-        case_data_to_run = self.case_data[:62]
-        for index in range(start_index, len(case_data_to_run)):
-            case = case_data_to_run[index]
-            console.print(f"\n사례 {index + 1} 시뮬레이션을 시작합니다", style="bold")
-            console.print("재판장을 제외한 다른 인원이 입장합니다", style="bold")
-            self.assign_roles()  # 역할을 무작위로 배정합니다.
-            self.initialize_court()
-            self.confirm_rights_and_obligations()
-            self.initial_statements(case)
-            self.judge_initial_question()
-
-            rounds = random.randint(3, 5)
-            self.debate_rounds(rounds)
-            self.save_progress(index)  # 현재 진행 상황을 기록합니다
+        case_data_to_run = self.case_data[: self.max_cases]
+        if self.workers == 1:
+            for index in range(start_index, len(case_data_to_run)):
+                self.run_case(index, case_data_to_run[index])
+                if self.consolidation_due(index):
+                    self.consolidate_memories()
+        else:
+            self.run_cases_parallel(case_data_to_run, start_index)
 
-            self.final_judgment()
-            self.reflect_and_summary()
-            console.print(f"사례 {index + 1} 공판이 종료되었습니다", style="bold")
-            self.save_court_log(
-                f"test_result/ours/1/court_session_test_case_{index + 1}.json"
-            )
+        for report in embedding_service_reports():
+            logging.info(f"Embedding service stats: {report}")
+        # 래퍼(캐시, 계측)부터 실제 백엔드까지 통계를 제공하는 계층을 모두 기록합니다.
+        llm = self.llm
+        while llm is not None:
+            if hasattr(llm, "report"):
+                logging.info(f"{type(llm).__name__} stats: {llm.report()}")
+            llm = getattr(llm, "llm", None)
+
+    def consolidation_due(self, index):
+        """
+        index번째 사례가 끝난 뒤 기억 정리를 할 차례인지 반환합니다.
+        """
+        return (
+            self.consolidator is not None and (index + 1) % self.consolidate_every == 0
+        )
+
+    def consolidate_memories(self):
+        """
+        사례가 늘어도 검색 지연이 일정하도록 변호사 기억의 중복을 합치고 크기를 제한합니다.
+        정리하는 동안 다른 사례가 같은 저장소를 검색하지 않도록 진행 중인 사례가 없을 때 호출합니다.
+        """
+        for lawyer in self.lawyers:
+            self.consolidator.consolidate(lawyer.db)
+
+    def run_cases_parallel(self, case_data_to_run, start_index):
+        """
+        여러 사례를 스레드에서 동시에 진행합니다.
+        사례별 콘솔 출력은 버퍼에 모았다가 사례 순서대로 내보내고,
+        진행 상황은 아직 끝나지 않은 첫 번째 사례 인덱스로 기록합니다.
+        기억 정리를 사용하면 every_cases개 사례 단위로 배치를 나누어 배치 사이에 정리합니다.
+        :param case_data_to_run: 실행할 사례 목록
+        :param start_index: 시작할 사례 인덱스
+        """
+        indices = list(range(start_index, len(case_data_to_run)))
+        batches = [indices]
+        if self.consolidator is not None:
+            batches = [[]]
+            for index in indices:
+                batches[-1].append(index)
+                if self.consolidation_due(index):
+                    batches.append([])
+        outputs = {}
+        finished = set()
+        next_to_flush = start_index
+
+        def run(index):
+            session, buffer = self.fork_case()
+            try:
+                session.run_case(index, case_data_to_run[index])
+                return buffer.getvalue(), True
+            except Exception:
+                logging.exception(f"Case {index + 1} failed")
+                return buffer.getvalue(), False
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in batches:
+                if not batch:
+                    continue
+                futures = {executor.submit(run, index): index for index in batch}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    output, ok = future.result()
+                    outputs[index] = output
+                    if ok:
+                        finished.add(index)
+                    while next_to_flush in outputs:
+                        self.console.file.write(outputs.pop(next_to_flush))
+                        self.console.file.flush()
+                        next_to_flush += 1
+                    first_unfinished = start_index
+                    while first_unfinished in finished:
+                        first_unfinished += 1
+                    self.save_progress(first_unfinished)
+                # 배치의 모든 사례가 끝나 저장소를 쓰거나 검색하는 스레드가 없습니다.
+                if self.consolidation_due(batch[-1]):
+                    self.consolidate_memories()
 
     def save_court_log(self, file_path):
         """
@@ -315,6 +679,16 @@ class CourtSimulation:
         logging.info(f"Court session log saved to {file_path}")
 
 
+def positive_int(value):
+    """
+    1 이상의 정수만 받는 argparse 형식 함수입니다.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
 def parse_arguments():
     """
     명령줄 인수를 해석합니다.
@@ -340,6 +714,42 @@ def parse_arguments():
     parser.add_argument(
         "--log_think", action="store_true", help="Log the agent think step"
     )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Number of cases to simulate concurrently",
+    )
+    parser.add_argument(
+        "--llm-cache-mode",
+        choices=CACHE_MODES,
+        help="Enable the LLM response cache with this mode "
+        "(overrides llm_cache in the configuration file)",
+    )
+    parser.add_argument(
+        "--max-cases",
+        type=int,
+        default=62,
+        help="Maximum number of cases to simulate (0 for all)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=None,
+        help="Show each speech live as it is generated",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for per-case random choices (default: seed in the config, "
+        "or replay.seed when llm_type is replay)",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report import and initialization time per component",
+    )
     return parser.parse_args()
 
 
@@ -348,7 +758,19 @@ def main():
     메인 함수
     """
     args = parse_arguments()
-    simulation = CourtSimulation(args.config, args.case, args.log_level, args.log_think)
+    simulation = CourtSimulation(
+        args.config,
+        args.case,
+        args.log_level,
+        args.log_think,
+        workers=args.workers,
+        max_cases=args.max_cases or None,
+        llm_cache_mode=args.llm_cache_mode,
+        stream=args.stream,
+        seed=args.seed,
+    )
+    if args.profile_startup:
+        simulation.print_startup_profile()
     simulation.run_simulation()
 
 
@@ -0,0 +1,73 @@
+"""
+에이전트 기억 저장소를 오프라인으로 정리합니다(중복 병합, 크기 제한).
+구성 파일의 memory_store와 memory_consolidation 설정을 사용하며, 명령줄 값이 우선합니다.
+
+사용 예:
+    python scripts/consolidate_memory.py --config role_config.json
+    python scripts/consolidate_memory.py --agents Alicia-Foreman --threshold 0.9 --retention frequent
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EMDB.consolidation import RETENTION_POLICIES, MemoryConsolidator  # noqa: E402
+from EMDB.db import db  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Deduplicate and cap agent memory collections."
+    )
+    parser.add_argument("--config", default="role_config.json")
+    parser.add_argument(
+        "--agents", nargs="+", help="Agent names (default: lawyers in the config)"
+    )
+    parser.add_argument("--threshold", type=float, help="Cosine similarity threshold")
+    parser.add_argument("--retention", choices=RETENTION_POLICIES)
+    parser.add_argument(
+        "--max-entries",
+        type=int,
+        help="Size cap applied to every collection (overrides the config)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments()
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    options = dict(config.get("memory_consolidation") or {})
+    # 명령으로 직접 실행하므로 enabled와 관계없이 정리합니다.
+    options.pop("enabled", None)
+    options.pop("every_cases", None)
+    if args.threshold is not None:
+        options["similarity_threshold"] = args.threshold
+    if args.retention:
+        options["retention"] = args.retention
+    if args.max_entries is not None:
+        options["max_entries"] = {
+            name: args.max_entries for name in ("experience", "case", "legal")
+        }
+    consolidator = MemoryConsolidator(**options)
+
+    store_config = config.get("memory_store", {})
+    agents = args.agents or [lawyer["name"] for lawyer in config["lawyers"]]
+    for agent_name in agents:
+        store = db(
+            agent_name,
+            store=store_config.get("mode", "per_agent"),
+            store_path=store_config.get("path", "db/shared"),
+            backend=store_config.get("backend", "chroma"),
+        )
+        consolidator.consolidate(store)
+
+
+if __name__ == "__main__":
+    main()
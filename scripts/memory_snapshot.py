@@ -0,0 +1,69 @@
+"""
+에이전트 기억 저장소의 스냅숏을 내보내거나 불러옵니다.
+스냅숏에는 세 컬렉션(experience, case, legal)의 문서, 메타데이터, 임베딩이 함께 들어 있어
+다른 머신에서도 임베딩 모델을 실행하지 않고 에이전트를 복원할 수 있습니다.
+구성 파일의 memory_store 설정으로 저장소를 엽니다.
+
+사용 예:
+    python scripts/memory_snapshot.py export --agent Alicia-Foreman --path snapshots/Alicia-Foreman
+    python scripts/memory_snapshot.py import --agent Alicia-Foreman --path snapshots/Alicia-Foreman
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EMDB.db import db  # noqa: E402
+from EMDB.snapshot import export_snapshot, import_snapshot  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Export or import an agent memory snapshot."
+    )
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--agent", required=True, help="Agent name")
+    parser.add_argument("--path", required=True, help="Snapshot directory")
+    parser.add_argument("--config", default="role_config.json")
+    parser.add_argument(
+        "--allow-model-mismatch",
+        action="store_true",
+        help="Import even if the snapshot used a different embedding model",
+    )
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments()
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    store_config = config.get("memory_store", {})
+    store = db(
+        args.agent,
+        store=store_config.get("mode", "per_agent"),
+        store_path=store_config.get("path", "db/shared"),
+        backend=store_config.get("backend", "chroma"),
+    )
+
+    start = time.perf_counter()
+    if args.command == "export":
+        counts = export_snapshot(store, args.path)["collections"]
+    else:
+        counts = import_snapshot(
+            store, args.path, allow_model_mismatch=args.allow_model_mismatch
+        )
+    logging.info(
+        f"{args.command.capitalize()}ed {args.agent} ({counts}) "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+에이전트별 기억 저장소(db/<agent_name>/chroma.sqlite3)를 하나의 공유 저장소로 옮깁니다.
+임베딩을 그대로 복사하므로 다시 인코딩하지 않습니다. 옮긴 뒤 구성 파일의
+memory_store.mode를 "shared"로 바꾸면 됩니다.
+
+사용 예:
+    python scripts/migrate_memory_store.py --source db --target db/shared
+    python scripts/migrate_memory_store.py --dry-run
+"""
+
+import argparse
+import glob
+import logging
+import os
+
+import chromadb
+
+PAGE_SIZE = 1000
+
+
+def find_agent_stores(source):
+    """
+    source 아래에서 chroma.sqlite3를 가진 에이전트 저장소 디렉터리를 찾습니다.
+    """
+    return sorted(
+        os.path.dirname(path)
+        for path in glob.glob(os.path.join(source, "*", "chroma.sqlite3"))
+    )
+
+
+def copy_collection(collection, target, page_size=PAGE_SIZE, dry_run=False):
+    """
+    컬렉션의 모든 항목을 같은 이름의 대상 컬렉션에 복사하고 복사한 항목 수를 반환합니다.
+    이미 대상에 있는 id는 덮어쓰므로 여러 번 실행해도 결과가 같습니다.
+    """
+    total = collection.count()
+    if dry_run or total == 0:
+        return total
+
+    destination = target.get_or_create_collection(
+        name=collection.name, metadata=collection.metadata
+    )
+    copied = 0
+    for offset in range(0, total, page_size):
+        page = collection.get(
+            offset=offset,
+            limit=page_size,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if not page["ids"]:
+            break
+        # chromadb는 메타데이터가 있는 항목과 없는 항목을 한 번의 upsert에 섞을 수 없습니다.
+        for has_metadata in (True, False):
+            indices = [
+                i
+                for i, metadata in enumerate(page["metadatas"])
+                if bool(metadata) == has_metadata
+            ]
+            if not indices:
+                continue
+            destination.upsert(
+                ids=[page["ids"][i] for i in indices],
+                documents=[page["documents"][i] for i in indices],
+                embeddings=[page["embeddings"][i] for i in indices],
+                metadatas=(
+                    [page["metadatas"][i] for i in indices] if has_metadata else None
+                ),
+            )
+        copied += len(page["ids"])
+    return copied
+
+
+def migrate(source, target_path, dry_run=False):
+    target = None if dry_run else chromadb.PersistentClient(path=target_path)
+    summary = {}
+    target_abspath = os.path.abspath(target_path)
+    for store_path in find_agent_stores(source):
+        if os.path.abspath(store_path) == target_abspath:
+            continue
+        client = chromadb.PersistentClient(path=store_path)
+        for collection in client.list_collections():
+            copied = copy_collection(collection, target, dry_run=dry_run)
+            summary[collection.name] = copied
+            logging.info(
+                f"{'Would copy' if dry_run else 'Copied'} {copied} entries "
+                f"from {store_path}/{collection.name}"
+            )
+    return summary
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Merge per-agent memory stores into one shared store."
+    )
+    parser.add_argument("--source", default="db", help="Directory of per-agent stores")
+    parser.add_argument("--target", default="db/shared", help="Shared store path")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count what would be copied"
+    )
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_arguments()
+    summary = migrate(args.source, args.target, dry_run=args.dry_run)
+    logging.info(
+        f"{len(summary)} collections, {sum(summary.values())} entries "
+        f"{'found' if args.dry_run else f'migrated to {args.target}'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
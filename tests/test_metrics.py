@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LLM.metrics import MetricsRecorder  # noqa: E402
+
+
+def make_record(agent):
+    return {
+        "agent": agent,
+        "role": "lawyer",
+        "phase": "speak",
+        "error": None,
+        "wall_time": 0.1,
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "retries": 0,
+    }
+
+
+def test_write_prometheus_concurrent_writers():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "metrics.prom")
+        recorder = MetricsRecorder(prometheus_path=path)
+        errors = []
+
+        def worker(agent):
+            try:
+                for _ in range(200):
+                    recorder.record(make_record(agent))
+                    recorder.write_prometheus()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=worker, args=(f"agent-{i}",)) for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        # 마지막으로 쓴 파일에는 모든 스레드의 최종 누계가 들어 있어야 합니다.
+        for i in range(4):
+            assert (
+                f'llm_calls_total{{agent="agent-{i}",role="lawyer",phase="speak"}} 200'
+                in text
+            )
+        assert not os.path.exists(path + ".tmp")
@@ -0,0 +1,74 @@
+import threading
+from typing import Any, Dict, Iterable
+
+
+class Transcript(list):
+    """
+    한 사례의 법정 대화 기록입니다. 항목을 추가할 때마다 서식이 적용된 문자열을
+    증분으로 이어 붙여 두므로, 기록 전체를 다시 포맷하지 않고 캐시된 문자열이나 그 일부를 돌려줍니다.
+    같은 사례의 모든 에이전트가 하나의 Transcript를 공유하며, 기록은 추가만 가능합니다.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = (), compactor=None):
+        super().__init__()
+        # 토큰 예산이 설정된 경우 context()가 사용하는 HistoryCompactor
+        self.compactor = compactor
+        self._lock = threading.Lock()
+        self._offsets = []  # 각 항목이 _text에서 시작하는 위치
+        self._text = ""
+        for entry in entries:
+            self.append(entry)
+
+    @staticmethod
+    def format_entry(entry: Dict[str, Any]) -> str:
+        role = entry["role"]
+        name = entry["name"]
+        content = entry["content"].replace("\n", "\n  ")
+        return f"{role} ({name}):\n  {content}"
+
+    def append(self, entry: Dict[str, Any]):
+        formatted = self.format_entry(entry)
+        with self._lock:
+            separator = "\n\n" if self._offsets else ""
+            self._offsets.append(len(self._text) + len(separator))
+            self._text += separator + formatted
+            super().append(entry)
+
+    def extend(self, entries: Iterable[Dict[str, Any]]):
+        for entry in entries:
+            self.append(entry)
+
+    def text(self, start: int = 0, end: int = None) -> str:
+        """
+        [start, end) 범위 항목의 서식 문자열을 반환합니다. 인자를 생략하면 전체 기록을 반환합니다.
+        :param start: 시작 항목 인덱스(음수 가능)
+        :param end: 끝 항목 인덱스(포함하지 않음, 음수 가능)
+        :return: 항목 사이를 빈 줄로 구분한 문자열
+        """
+        with self._lock:
+            text, offsets = self._text, self._offsets
+            start, end, _ = slice(start, end).indices(len(offsets))
+            if start >= end:
+                return ""
+            begin = offsets[start]
+            finish = offsets[end] - 2 if end < len(offsets) else len(text)
+            if begin == 0 and finish == len(text):
+                return text
+            return text[begin:finish]
+
+    def context(self) -> str:
+        """
+        LLM 호출에 넣을 대화 기록을 반환합니다. compactor가 있으면 토큰 예산에 맞게 압축합니다.
+        """
+        if self.compactor is None:
+            return self.text()
+        return self.compactor.render(self)
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def _append_only(self, *args, **kwargs):
+        raise TypeError("Transcript is append-only")
+
+    __setitem__ = __delitem__ = __iadd__ = _append_only
+    insert = pop = remove = clear = sort = reverse = _append_only